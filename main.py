@@ -2,13 +2,17 @@
 # Imports
 # =========================
 
-import os, re
-from datetime import datetime
+import asyncio, copy, functools, hashlib, inspect, os
+import numpy as np
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from dotenv import load_dotenv
-from openai import OpenAI
-from typing import Dict, List
-from tools import known_actions
-from system_prompt import prompt_template
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, RateLimitError
+from tenacity import RetryCallState, retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from tools import known_actions, tool_schemas, format_action_input
+from system_prompt import prompt_template, date_prompt_template
 
 # =========================
 # Environment & Client
@@ -17,7 +21,82 @@ from system_prompt import prompt_template
 _ = load_dotenv()
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+# =========================
+# Retry policy
+# =========================
+
+_exponential_backoff = wait_exponential_jitter(initial=1, max=30)
+
+def _wait_retry_after(retry_state: RetryCallState) -> float:
+    """
+    Waits as long as the server asks for on a 429 (retry-after-ms / retry-after headers),
+    otherwise backs off exponentially with jitter.
+    """
+    error = retry_state.outcome.exception()
+    if isinstance(error, RateLimitError):
+        headers = error.response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return min(float(headers["retry-after-ms"]) / 1000, 60)
+            if "retry-after" in headers:
+                return min(float(headers["retry-after"]), 60)
+        except ValueError:
+            pass # e.g. an HTTP-date Retry-After, fall back to backoff
+    return _exponential_backoff(retry_state)
+
+
+@retry(
+    stop=stop_after_attempt(5),
+    wait=_wait_retry_after,
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError)),
+    reraise=True
+)
+async def _create_completion(**kwargs):
+    """Calls chat.completions.create, retrying rate limits, connection errors and timeouts."""
+    # The SDK's own retries are disabled here so attempts are not multiplied
+    return await client.with_options(max_retries=0).chat.completions.create(**kwargs)
+
+# =========================
+# Async tool dispatch
+# =========================
+
+# Blocking tools spend most of their time waiting on the network (up to 15s for a scrape).
+# They get their own thread pool, so many concurrent tool calls (e.g. from run_many) neither queue
+# behind the default executor's few workers nor starve what asyncio runs there (DNS lookups, input()).
+TOOL_THREADS = 32
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool")
+
+
+def _to_async(tool: Callable[[Any], str]) -> Callable[[Any], Awaitable[str]]:
+    """
+    Wraps a blocking tool (HTTP, file I/O, PDF parsing) so that awaiting it runs the
+    tool in a worker thread and leaves the event loop free. Coroutine tools pass through.
+    """
+    if inspect.iscoroutinefunction(tool):
+        return tool
+
+    async def run_in_thread(action_input: Any) -> str:
+        return await asyncio.get_running_loop().run_in_executor(_tool_executor, tool, action_input)
+    return run_in_thread
+
+
+# Same keys as known_actions, but every value is awaitable
+_async_actions: Dict[str, Callable[[Any], Awaitable[str]]] = {
+    name: _to_async(tool) for name, tool in known_actions.items()
+}
+
+# =========================
+# Semantic observation cache
+# =========================
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+
+# Only free-text queries are matched by meaning. URLs, locations and expressions that
+# differ by a single character point at different things, so they are never reused.
+SEMANTIC_CACHE_ACTIONS = {"search_internet"}
 
 # =========================
 # Define Agent class
@@ -26,18 +105,90 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 """
 Step by step explanation of the Agent class:
 1. agent = Agent(...) runs __init__ → stores the system message.
-2. agent(<user_message>) runs __call__ → adds user message → calls execute.
-3. execute() sends everything to the GPT model → gets response.
+2. await agent(<user_message>) runs __call__ → adds user message → awaits execute.
+3. execute() sends everything, plus the tool schemas, to the GPT model → gets response.
 4. That response is stored and returned.
-5. run() manages the ReAct loop, executing actions and feeding observations back to the agent.
-6. It continues until a final answer is produced or max_turns is reached.
+5. run() manages the ReAct loop: whenever the response contains tool calls, it executes
+   them and feeds the results back to the agent as tool messages.
+6. It continues until a response without tool calls (the final answer) or max_turns is reached.
+
+All API calls are coroutines, so several agents can share one event loop (see run_many).
 """
 
+# Default cap on the tokens generated per turn (see Agent's max_tokens). Reasoning models count their
+# hidden reasoning against the cap too, so they get no default cap: it would cut most replies off
+DEFAULT_MAX_TOKENS = 512
+_REASONING_MODEL_PREFIXES = ("gpt-5", "o1", "o3", "o4")
+
+# Observations shorter than this are always repeated in full, a reference wouldn't be shorter
+_MIN_DEDUP_CHARS = 200
+
 # Define a type alias for message dictionaries
-Message = Dict[str, str]
+# (assistant messages may carry a list of tool_calls, tool messages a tool_call_id)
+Message = Dict[str, Any]
+
+
+def _observation_reference(call_id: str) -> str:
+    """Returns the text that stands in for an observation identical to the result of tool call call_id."""
+    return f"(identical to the result of tool call {call_id})"
+
+
+def _assistant_message(message: Dict[str, Any]) -> Message:
+    """
+    Reduces an assistant message from the API (as a dict) to the fields that are sent back
+    in later requests: content and, if present, the tool calls.
+    """
+    reply: Message = {"role": "assistant", "content": message.get("content")}
+    tool_calls = [
+        {
+            "id": call["id"],
+            "type": "function",
+            "function": {"name": call["function"]["name"], "arguments": call["function"]["arguments"]}
+        }
+        for call in message.get("tool_calls") or []
+    ]
+    if tool_calls:
+        reply["tool_calls"] = tool_calls
+    return reply
+
+
+@functools.lru_cache(maxsize=8)
+def build_system_message(content: str) -> Message:
+    """
+    Returns the system message for content. Cached so that every agent (including
+    forks and run_many sub-agents) shares one dict instead of building its own.
+    This is safe because messages are only ever appended, never mutated in place.
+    """
+    return {"role": "system", "content": content}
+
+
+def _today() -> str:
+    """Returns today's local date in ISO format (e.g. "2025-01-31")."""
+    return date.today().isoformat()
+
+
+@functools.lru_cache(maxsize=8)
+def build_date_message(current_date: str) -> Message:
+    """Returns the shared system message announcing current_date (e.g. "2025-01-31")."""
+    return build_system_message(date_prompt_template.format(current_date=current_date))
+
 
 class Agent:
-    def __init__(self, system: str ="", model: str ="gpt-5-mini", temperature: float = 1.0) -> None:
+    def __init__(
+        self,
+        system: str = "",
+        model: str = "gpt-5-mini",
+        temperature: float = 1.0,
+        cache_path: Optional[str] = None,
+        semantic_cache: bool = False,
+        current_date: Optional[str] = None,
+        max_context_msgs: Optional[int] = 12,
+        summarize_over: Optional[int] = None,
+        summary_model: str = "gpt-4o-mini",
+        stream: bool = True,
+        max_tokens: Union[int, str, None] = "auto",
+        stop: Optional[List[str]] = None,
+    ) -> None:
         """
         Initializes the agent with a system prompt and model settings.
         
@@ -45,6 +196,18 @@ class Agent:
             system: The system prompt to guide the agent's behavior.
             model: The identifier for the OpenAI model (e.g., "gpt-5-mini").
             temperature: The sampling temperature for the model (0.0 for deterministic).
+            cache_path: Optional JSON file that persists cached responses across runs.
+            semantic_cache: Reuse observations of earlier searches whose query means the same thing.
+            current_date: A fixed date to announce in its own system message after the static prompt.
+                By default today's date is used and updated when the day changes.
+            max_context_msgs: Sliding window size; only this many non-system messages are kept (None keeps all).
+            summarize_over: Observations longer than this many characters are summarized before being fed back (None disables).
+            summary_model: The cheaper model used to summarize long observations.
+            stream: Print responses token by token as they are generated.
+            max_tokens: Upper bound on the tokens generated per turn, which bounds each turn's latency (None for no limit).
+                "auto" uses DEFAULT_MAX_TOKENS, or no limit for reasoning models such as gpt-5-mini, whose hidden
+                reasoning counts against it too. A reply cut off by the limit is reported as an error.
+            stop: Optional stop sequences that end a turn early. Reasoning models reject this parameter.
         """
         self.system = system
         self.model = model
@@ -52,116 +215,537 @@ class Agent:
 
         self.messages: List[Message] = []
         if self.system:
-            self.messages.append({"role": "system", "content": system})
+            self.messages.append(build_system_message(system))
+        # Dynamic content goes after the static system prompt so the prompt-cache prefix stays stable
+        self.current_date = current_date
+        self.messages.append(build_date_message(current_date or _today()))
+        # Leading system messages are never evicted by the sliding window
+        self._num_pinned = len(self.messages)
+
+        # Context size policy
+        self.max_context_msgs = max_context_msgs
+        self.summarize_over = summarize_over
+        self.summary_model = summary_model
 
+        self.stream = stream
+        if max_tokens == "auto":
+            max_tokens = None if model.startswith(_REASONING_MODEL_PREFIXES) else DEFAULT_MAX_TOKENS
+        self.max_tokens = max_tokens
+        self.stop = stop
 
-    def __call__(self, message: str) -> str:
+        # SHA-1 of each observation already in the context -> the id of the tool call that produced it
+        self._obs_hashes: Dict[str, str] = {}
+
+        # Exact-match response cache, only used when temperature is 0 (see execute)
+        self.cache_path = cache_path
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache: Dict[str, Message] = self._load_cache()
+
+        # Semantic observation cache: one unit-length embedding row per stored observation
+        self.semantic_cache = semantic_cache
+        self._sem_embeddings: Optional[np.ndarray] = None
+        self._sem_observations: List[str] = []
+
+
+    async def __call__(self, message: str) -> str:
         """
-        Allows the agent instance to be called like a function.
+        Allows the agent instance to be awaited like a function.
         Adds the user message, executes one step, and returns the result.
+        Tool calls requested by the response are stored but not executed (see run).
         
         Args:
             message: The user's input message.
             
         Returns:
-            The assistant's response (which could be a Thought, Action, or Answer).
+            The text of the assistant's response.
+        """
+        reply = await self._step({"role": "user", "content": message})
+        return reply["content"] or ""
+
+
+    async def _step(self, *new_messages: Message) -> Message:
+        """Appends new_messages (a user turn or tool results), then gets, stores and returns the assistant's reply."""
+        self._refresh_date()
+        self.messages.extend(new_messages)
+        reply = await self.execute()
+        self.messages.append(reply)
+        self._prune_context()
+        return reply
+
+
+    def _refresh_date(self) -> None:
+        """
+        Replaces the date message if the day has changed since the last turn, so a
+        long-lived agent never works with a stale date. Within a day the same cached
+        message object is kept, leaving the prompt prefix unchanged.
+        """
+        if self.current_date is not None:
+            return
+        date_message = build_date_message(_today())
+        # The date message is always the last pinned message
+        if self.messages[self._num_pinned - 1] is not date_message:
+            self.messages[self._num_pinned - 1] = date_message
+
+
+    def _prune_context(self) -> None:
+        """
+        Applies the sliding window: keeps the pinned system messages plus the last
+        max_context_msgs messages, so each API call's prompt stays bounded.
+        The latest user message is always kept, so a long run never loses its question.
+        """
+        if self.max_context_msgs is None:
+            return
+        history = self.messages[self._num_pinned:]
+        if len(history) <= self.max_context_msgs:
+            return
+        start = len(history) - self.max_context_msgs
+        # Never cut between an assistant message's tool_calls and their tool results:
+        # a tool message without the call it answers is rejected by the API
+        while start < len(history) and history[start]["role"] == "tool":
+            start += 1
+        window = history[start:]
+        question = max((i for i, message in enumerate(history) if message["role"] == "user"), default=None)
+        if question is not None and question < start:
+            window.insert(0, history[question])
+        # An evicted observation can no longer be referenced: its first surviving reference gets the full text back
+        evicted = {message["tool_call_id"]: message["content"] for message in history[:start] if message["role"] == "tool"}
+        for digest, call_id in list(self._obs_hashes.items()):
+            if call_id in evicted:
+                self._expand_references(window, digest, call_id, evicted[call_id])
+        self.messages = self.messages[:self._num_pinned] + window
+
+
+    def _expand_references(self, window: List[Message], digest: str, call_id: str, observation: str) -> None:
+        """
+        Replaces the first reference in window to the evicted result of call_id by the observation itself
+        and points later references (and the hash table) at it. Messages are replaced, not mutated,
+        since forks share them.
         """
-        self.messages.append({"role": "user", "content": message})
-        result = self.execute()
-        self.messages.append({"role": "assistant", "content": result})
-        return result
+        reference = _observation_reference(call_id)
+        new_id = None
+        for n, message in enumerate(window):
+            if message["role"] != "tool" or message["content"] != reference:
+                continue
+            if new_id is None:
+                new_id = message["tool_call_id"]
+                window[n] = {**message, "content": observation}
+            else:
+                window[n] = {**message, "content": _observation_reference(new_id)}
+        if new_id is None:
+            del self._obs_hashes[digest]
+        else:
+            self._obs_hashes[digest] = new_id
 
 
-    def execute(self) -> str:
-        """Execute method sends the accumulated messages to the OpenAI API and retrieves the assistant's response"""
+    async def summarize(self, observation: str, question: str) -> str:
+        """
+        Condenses a long observation with summary_model, keeping only what is relevant to the question.
+        Falls back to the original observation if the summary call fails.
+        """
         try:
-            completion = client.chat.completions.create(
-                model=self.model,
-                temperature=self.temperature,
-                messages=self.messages
+            completion = await _create_completion(
+                model=self.summary_model,
+                messages=[
+                    {"role": "system", "content": "Summarize the text below. Keep every fact, number, date and URL relevant to the question; drop everything else."},
+                    {"role": "user", "content": f"Question: {question}\n\nText:\n{observation}"}
+                ]
             )
             return completion.choices[0].message.content
         except Exception as e:
-            return f"Error during API call: {e}"
+            print(f" -- Could not summarize observation: {e}")
+            return observation
+
+
+    def _request(self) -> Dict[str, Any]:
+        """Returns the chat completion parameters for the current conversation."""
+        request = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": self.messages,
+            "tools": tool_schemas,
+            "tool_choice": "auto"
+        }
+        # max_completion_tokens replaces the deprecated max_tokens and is accepted by every current model
+        if self.max_tokens is not None:
+            request["max_completion_tokens"] = self.max_tokens
+        if self.stop:
+            request["stop"] = self.stop
+        return request
+
+
+    async def execute(self) -> Message:
+        """
+        Execute method sends the accumulated messages to the OpenAI API and retrieves the assistant's response message.
+        In streaming mode its text is also printed as it is generated (cached responses and errors are printed whole).
+        """
+        # Only deterministic requests are cached, otherwise a repeat would freeze one random sample
+        cacheable = self.temperature == 0
+        if cacheable:
+            key = self._cache_key()
+            if key in self._cache:
+                self.cache_hits += 1
+                if self.stream and self._cache[key]["content"]:
+                    print(self._cache[key]["content"])
+                return self._cache[key]
+            self.cache_misses += 1
+
+        try:
+            if self.stream:
+                reply, finish_reason = await self._stream_completion()
+            else:
+                completion = await _create_completion(**self._request())
+                reply = _assistant_message(completion.choices[0].message.model_dump())
+                finish_reason = completion.choices[0].finish_reason
+            # A truncated reply may be empty or end mid tool call; it must be neither an answer nor cached
+            if finish_reason == "length":
+                raise RuntimeError(f"the response was cut off by the max_tokens limit ({self.max_tokens})")
+        except Exception as e:
+            reply = {"role": "assistant", "content": f"Error during API call: {e}"}
+            if self.stream:
+                print(reply["content"])
+            return reply
+
+        if cacheable:
+            self._cache[key] = reply
+            self._save_cache()
+        return reply
 
 
-    def run(self, prompt: str, max_turns: int = 5) -> str:
+    async def _stream_completion(self) -> Tuple[Message, Optional[str]]:
+        """
+        Streams the response, printing its text as it arrives so the first words appear immediately.
+        Tool calls arrive in fragments (id and name first, then the arguments piece by piece)
+        and are reassembled by their index. Returns the message and the stream's finish_reason.
+        """
+        stream = await _create_completion(**self._request(), stream=True)
+        text = ""
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+        finish_reason = None
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta
+            if delta.content:
+                print(delta.content, end="", flush=True)
+                text += delta.content
+            for fragment in delta.tool_calls or []:
+                call = tool_calls.setdefault(fragment.index, {"id": "", "function": {"name": "", "arguments": ""}})
+                if fragment.id:
+                    call["id"] = fragment.id
+                if fragment.function and fragment.function.name:
+                    call["function"]["name"] += fragment.function.name
+                if fragment.function and fragment.function.arguments:
+                    call["function"]["arguments"] += fragment.function.arguments
+        if text:
+            print()
+        message = _assistant_message({"content": text or None, "tool_calls": [tool_calls[index] for index in sorted(tool_calls)]})
+        return message, finish_reason
+
+
+    def _cache_key(self) -> str:
+        """Hashes everything that determines the model's response: the whole request (model, messages, limits...)."""
+        # orjson serializes long message histories several times faster than the json module
+        payload = orjson.dumps(self._request(), option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+
+
+    def _load_cache(self) -> Dict[str, Message]:
+        """Reads the response cache from cache_path, or returns an empty cache if there is none or it is unreadable."""
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, "rb") as file:
+                cache = orjson.loads(file.read())
+        except (OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+
+    def _save_cache(self) -> None:
+        """
+        Writes the response cache to cache_path, if one was given. Best-effort: a cache that
+        can't be written is simply skipped. Entries saved meanwhile by other agents
+        (e.g. under run_many) are merged in first, so agents don't drop each other's entries.
+        """
+        if not self.cache_path:
+            return
+        for key, reply in self._load_cache().items():
+            self._cache.setdefault(key, reply)
+        try:
+            # Write to a temporary file first so concurrent readers never see half a cache
+            temp_path = f"{self.cache_path}.{os.getpid()}.{id(self)}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(orjson.dumps(self._cache))
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
+
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Returns the unit-length embedding of text, or None if the embedding call fails."""
+        try:
+            response = await client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+        except Exception as e:
+            print(f" -- Semantic cache unavailable: {e}")
+            return None
+        embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return embedding / np.linalg.norm(embedding)
+
+
+    async def run_action(self, action: str, action_input: Any) -> str:
+        """
+        Executes a known action, reusing a cached observation when a semantically
+        equivalent call was already made by this agent.
+        
+        Args:
+            action: The tool name from known_actions.
+            action_input: The tool's input (a string, or a list of URLs for scrape_many).
+            
+        Returns:
+            The tool's observation.
+        """
+        if not (self.semantic_cache and action in SEMANTIC_CACHE_ACTIONS):
+            return await _async_actions[action](action_input)
+
+        embedding = await self._embed(f"{action}: {action_input}")
+        if embedding is None:
+            return await _async_actions[action](action_input)
+
+        if self._sem_embeddings is not None:
+            # Cosine similarity against every stored key in one matrix-vector product
+            similarities = self._sem_embeddings @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] >= SEMANTIC_CACHE_THRESHOLD:
+                print(f" -- Reusing cached observation (similarity {similarities[best]:.3f})")
+                return self._sem_observations[best]
+
+        observation = await _async_actions[action](action_input)
+        # Failed calls are not cached so a later retry can still succeed
+        if not observation.startswith("Error"):
+            row = embedding[np.newaxis, :]
+            self._sem_embeddings = row if self._sem_embeddings is None else np.vstack([self._sem_embeddings, row])
+            self._sem_observations.append(observation)
+        return observation
+
+
+    async def _observe(self, tool_call: Message, question: str) -> str:
+        """Runs one tool call for the ReAct loop and returns its (possibly summarized) observation."""
+        action = tool_call["function"]["name"]
+        try:
+            if action not in _async_actions:
+                raise ValueError(f"Unknown action: {action}")
+            action_input = format_action_input(action, orjson.loads(tool_call["function"]["arguments"]))
+            print(f" -- Running {action}: {action_input}")
+            observation = await self.run_action(action, action_input)
+        except Exception as e:
+            observation = f"Error executing action {action}: {e}"
+        print(f" -- Observation: {observation}")
+
+        # Long observations (e.g. scraped pages) are condensed before they enter the context
+        if self.summarize_over is not None and len(observation) > self.summarize_over:
+            observation = await self.summarize(observation, question)
+            print(f" -- Summarized observation: {observation}")
+        return observation
+
+
+    async def run(self, prompt: str, max_turns: int = 5) -> str:
         """
         Run the agent in a loop until it produces a final answer or reaches max_turns.
-        It looks for "Action: <action>: <input>" patterns in the agent's responses,
-        executes the corresponding action, and feeds the observation back into the agent.
-        Finally, it returns the agent's last response when no more actions are found.
+        Whenever the agent's response requests tool calls, it executes all of them
+        concurrently and feeds the results back into the agent.
+        Finally, it returns the agent's first response that requests no more tools.
         
         Args:
             prompt: The initial user query.
             max_turns: The maximum number of tool-use cycles before stopping.
             
         Returns:
-            The final "Answer:" from the agent.
+            The final answer from the agent.
         """
-        i = 0
-        next_prompt = prompt
+        # 1. Get the agent's first response (an answer, or tool calls)
+        reply = await self._step({"role": "user", "content": prompt})
+        return await self._react_loop(prompt, reply, max_turns)
+
+
+    async def _react_loop(self, prompt: str, reply: Message, max_turns: int) -> str:
+        """
+        Continues the ReAct loop from the agent's first reply to prompt.
+        Shared by run() and run_batch(), which obtain that first reply differently.
+        """
+        i = 1
+        while True:
+            # Streamed responses were already printed by execute()
+            if not self.stream and reply["content"]:
+                print(reply["content"])
+
+            # 2. A response without tool calls is the final answer
+            tool_calls = reply.get("tool_calls")
+            if not tool_calls:
+                return reply["content"] or ""
+
+            # 3. Run all tools concurrently and collect the observations in order
+            observations = await asyncio.gather(
+                *(self._observe(tool_call, prompt) for tool_call in tool_calls)
+            )
+            tool_messages = self._tool_messages(tool_calls, observations)
 
-        # Regular expression to match lines with the pattern "Action: <tool_name>: <input_string>"
-        action_re = re.compile(r'^Action: (\w+): (.*)$')
+            if i >= max_turns:
+                # Every tool call still needs its result, or the next request would be rejected
+                self.messages.extend(tool_messages)
+                return "Agent reached maximum turns without a final answer."
 
-        while i < max_turns:
+            # 4. Feed the observations back and get the next response
+            reply = await self._step(*tool_messages)
             i += 1
-            # 1. Get the agent's response (Thought, Action, or Answer)
-            result = self(next_prompt)
-            print(result)
-
-            # 2. Find and execute actions
-            # Split the result into lines, look for action patterns, extract into a list
-            actions = [
-                action_re.match(a) for a in result.splitlines() if action_re.match(a)
-            ]
-
-            if actions:
-                action, action_input = actions[0].groups() # Get the first action's name and input
-                if action not in known_actions:
-                    raise ValueError(f"Unknown action: {action}")
+
+
+    def _tool_messages(self, tool_calls: List[Message], observations: List[str]) -> List[Message]:
+        """
+        Wraps each observation in a tool message answering its tool call. An observation identical
+        to one still in the context is replaced by a reference to it, so the same bytes aren't prefilled twice.
+        """
+        messages = []
+        for tool_call, observation in zip(tool_calls, observations):
+            if len(observation) > _MIN_DEDUP_CHARS:
+                digest = hashlib.sha1(observation.encode("utf-8")).hexdigest()
+                earlier = self._obs_hashes.get(digest)
+                if earlier is not None:
+                    observation = _observation_reference(earlier)
                 else:
-                    try:
-                        # 3. Run the tool and get the observation
-                        print(f" -- Running {action}: {action_input}")
-                        observation = known_actions[action](action_input) # Execute the action if found
-                    except Exception as e:
-                        observation = f"Error executing action {action}: {e}"
-
-                print(f" -- Observation: {observation}")
-                
-                # 4. Feed the observation back
-                next_prompt = (
-                    f"Observation: {observation}\n\n"
-                    f"Given the original user question: \"{prompt}\", do ONE of the following:\n"
-                    "- If the observation already contains the answer or enough data to compute it, respond immediately with `Answer: ...`.\n"
-                    "- Otherwise, continue the ReAct loop with Thought → Action → PAUSE → Observation, and produce exactly ONE next Action.\n"
-                )
-            else:
-                return result
+                    self._obs_hashes[digest] = tool_call["id"]
+            messages.append({"role": "tool", "tool_call_id": tool_call["id"], "content": observation})
+        return messages
+
+
+    def fork(self) -> "Agent":
+        """
+        Returns an independent agent with the same settings and a copy of the current conversation.
+        The exact-match response cache is shared, since its entries are valid for any conversation.
+        """
+        clone = copy.copy(self)
+        clone.messages = list(self.messages)
+        clone._sem_embeddings = None
+        clone._sem_observations = []
+        clone._obs_hashes = dict(self._obs_hashes)
+        return clone
+
+
+    async def run_batch(self, prompts: List[str], max_turns: int = 5, poll_interval: float = 30.0, max_concurrency: int = 5) -> List[str]:
+        """
+        Answers many non-interactive prompts, sending every first turn through the
+        OpenAI Batch API (half price, results within 24h). Prompts that need tools
+        then continue their ReAct loop with regular API calls.
+        Each prompt runs in its own fork of this agent, without streaming
+        (the follow-up loops run at once, so their token fragments would interleave).
+        
+        Args:
+            prompts: The user queries to answer.
+            max_turns: The maximum number of tool-use cycles per prompt.
+            poll_interval: Seconds to wait between batch status checks.
+            max_concurrency: The maximum number of follow-up loops talking to the API at once.
             
-        return "Agent reached maximum turns without a final answer."
+        Returns:
+            The final responses, in the same order as prompts.
+        """
+        self._refresh_date()
+        agents = [self.fork() for _ in prompts]
+        lines = []
+        for n, (agent, prompt) in enumerate(zip(agents, prompts)):
+            agent.stream = False
+            agent.messages.append({"role": "user", "content": prompt})
+            lines.append(orjson.dumps({
+                "custom_id": str(n),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": agent._request()
+            }))
+
+        try:
+            batch_file = await client.files.create(file=("batch.jsonl", b"\n".join(lines)), purpose="batch")
+            batch = await client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            print(f" -- Submitted batch {batch.id} with {len(prompts)} requests")
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                await asyncio.sleep(poll_interval)
+                batch = await client.batches.retrieve(batch.id)
+            if batch.status != "completed":
+                return [f"Error during batch API call: batch {batch.id} {batch.status}"] * len(prompts)
+
+            # Requests that failed inside a completed batch are missing or carry an error status;
+            # replies cut off by max_tokens are treated as failed too
+            first_turns: Dict[str, Message] = {}
+            if batch.output_file_id:
+                output = await client.files.content(batch.output_file_id)
+                for line in output.text.splitlines():
+                    record = orjson.loads(line)
+                    response = record.get("response") or {}
+                    if response.get("status_code") == 200:
+                        choice = response["body"]["choices"][0]
+                        if choice.get("finish_reason") != "length":
+                            first_turns[record["custom_id"]] = _assistant_message(choice["message"])
+        except Exception as e:
+            return [f"Error during batch API call: {e}"] * len(prompts)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def finish(n: int, agent: "Agent", prompt: str) -> str:
+            reply = first_turns.get(str(n))
+            if reply is None:
+                return f"Error during batch API call: no response for prompt {n}"
+            agent.messages.append(reply)
+            agent._prune_context()
+            async with semaphore:
+                return await agent._react_loop(prompt, reply, max_turns)
+
+        return await asyncio.gather(*(finish(n, agent, prompt) for n, (agent, prompt) in enumerate(zip(agents, prompts))))
+
+
+async def run_many(prompts: List[str], max_concurrency: int = 5, **agent_kwargs) -> List[str]:
+    """
+    Runs several independent prompts concurrently on one event loop.
+    Each prompt gets its own Agent so conversation histories never mix. Streaming is
+    turned off, since the token fragments of concurrent agents would interleave on stdout.
+    
+    Args:
+        prompts: The user queries to answer.
+        max_concurrency: The maximum number of agents talking to the API at once.
+        **agent_kwargs: Passed through to every Agent (system, model, temperature...), except stream.
+        
+    Returns:
+        The final responses, in the same order as prompts.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(prompt: str) -> str:
+        async with semaphore:
+            return await Agent(**{**agent_kwargs, "stream": False}).run(prompt)
+
+    return await asyncio.gather(*(run_one(prompt) for prompt in prompts))
 
 # =========================
 # Run the agent pipeline
 # =========================
 
-if __name__ == "__main__":
-    # 1. Format the ReAct system prompt
-    system_prompt = prompt_template.format(
-        current_date=datetime.now().strftime("%Y-%m-%d")
-    )
+async def main() -> None:
+    # 1. Create the agent instance with the static ReAct prompt (today's date is added automatically)
+    agent = Agent(system=prompt_template)
     
-    # 2. Create the agent instance
-    agent = Agent(system=system_prompt)
-    
-    # 3. Run the agent
+    # 2. Run the agent
+    # input() blocks, so it runs in a worker thread to keep the event loop free
     print("Welcome to the ReAct Agent. Type 'exit' to quit.")
     while True:
-        user_query = input("\nEnter your question: ")
+        user_query = await asyncio.to_thread(input, "\nEnter your question: ")
         if user_query.lower() == 'exit':
             break
-        final_response = agent.run(user_query)
+        final_response = await agent.run(user_query)
         print(f"\n\nFinal Response:\n{final_response}")
 
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
@@ -0,0 +1,549 @@
+import asyncio
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import numpy as np
+import orjson
+import pytest
+from openai import RateLimitError
+from tenacity import RetryCallState
+
+# main creates its OpenAI client at import time; no request is ever sent in these tests
+os.environ.setdefault("OPENAI_API_KEY", "test_openai_key")
+import main
+from main import Agent
+
+
+def tool_call(call_id, name, arguments):
+    """Builds an assistant tool call as stored in the conversation."""
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments}}
+
+
+def scripted_agent(replies, **agent_kwargs):
+    """
+    Returns an agent whose execute() answers with the given assistant messages in order,
+    and the list of conversations (snapshots of agent.messages) it was asked to complete.
+    """
+    agent = Agent(system="You are a test agent.", stream=False, **agent_kwargs)
+    requests_sent = []
+    replies = iter(replies)
+
+    async def execute():
+        requests_sent.append(list(agent.messages))
+        return next(replies)
+
+    agent.execute = execute
+    return agent, requests_sent
+
+
+def assert_valid_request(messages):
+    """Checks the rules the chat completions API enforces on a conversation."""
+    assert any(message["role"] == "user" for message in messages), "the request has no user question"
+    open_calls = set()
+    for message in messages:
+        if message["role"] == "tool":
+            assert message["tool_call_id"] in open_calls, "tool result without the assistant message that requested it"
+            open_calls.discard(message["tool_call_id"])
+        else:
+            assert not open_calls, "tool calls left unanswered"
+            open_calls = {call["id"] for call in message.get("tool_calls", [])}
+
+
+@pytest.fixture(autouse=True)
+def fake_calculator():
+    """Replaces the calculator tool with one that never touches the thread pool."""
+    async def calculator(expression):
+        return f"result of {expression}"
+    with patch.dict(main._async_actions, {"calculator": calculator}):
+        yield
+
+
+# =========================
+# Test the retry policy
+# =========================
+
+def rate_limit_error(headers):
+    """Builds the RateLimitError the SDK raises for a 429 response with the given headers."""
+    response = SimpleNamespace(status_code=429, headers=headers, request=None)
+    return RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def failed_attempt(error, attempt_number=1):
+    """Returns the retry state of an attempt that raised error."""
+    retry_state = RetryCallState(retry_object=None, fn=None, args=(), kwargs={})
+    retry_state.attempt_number = attempt_number
+    try:
+        raise error
+    except Exception as e:
+        retry_state.set_exception((type(e), e, e.__traceback__))
+    return retry_state
+
+
+class TestRetryPolicy:
+    """Tests for _wait_retry_after and the retries of _create_completion."""
+
+    @pytest.mark.parametrize("headers, wait", [
+        ({"retry-after-ms": "1500"}, 1.5),
+        ({"retry-after": "7"}, 7.0),
+        ({"retry-after-ms": "250", "retry-after": "7"}, 0.25),
+        ({"retry-after": "600"}, 60),
+        ({"retry-after-ms": "600000"}, 60),
+    ])
+    def test_waits_as_long_as_the_server_asks(self, headers, wait):
+        """Test that the retry-after headers are honoured, up to 60 seconds."""
+        assert main._wait_retry_after(failed_attempt(rate_limit_error(headers))) == wait
+
+    @pytest.mark.parametrize("headers", [{"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, {}])
+    def test_falls_back_to_backoff(self, headers):
+        """Test that an HTTP-date or missing Retry-After backs off exponentially with jitter."""
+        assert 1 <= main._wait_retry_after(failed_attempt(rate_limit_error(headers))) <= 2
+        assert 4 <= main._wait_retry_after(failed_attempt(rate_limit_error(headers), attempt_number=3)) <= 5
+
+    def test_other_errors_back_off(self):
+        """Test that errors without headers use the exponential backoff."""
+        assert 1 <= main._wait_retry_after(failed_attempt(ValueError("boom"))) <= 2
+
+    def fake_client(self, create):
+        """Returns a client whose chat.completions.create is create, and records with_options calls."""
+        chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+        return SimpleNamespace(with_options=Mock(return_value=SimpleNamespace(chat=chat)))
+
+    def test_rate_limit_is_retried(self):
+        """Test that a rate-limited call is retried, with the SDK's own retries disabled."""
+        create = AsyncMock(side_effect=[rate_limit_error({"retry-after-ms": "0"})] * 2 + ["completion"])
+        fake_client = self.fake_client(create)
+
+        with patch('main.client', fake_client):
+            assert asyncio.run(main._create_completion(model="gpt-4o-mini")) == "completion"
+
+        assert create.call_count == 3
+        fake_client.with_options.assert_called_with(max_retries=0)
+
+    def test_gives_up_after_five_attempts(self):
+        """Test that the last rate limit error is raised after five attempts."""
+        create = AsyncMock(side_effect=rate_limit_error({"retry-after-ms": "0"}))
+
+        with patch('main.client', self.fake_client(create)), pytest.raises(RateLimitError):
+            asyncio.run(main._create_completion(model="gpt-4o-mini"))
+
+        assert create.call_count == 5
+
+    def test_other_errors_are_not_retried(self):
+        """Test that errors other than rate limits, connection errors and timeouts fail at once."""
+        create = AsyncMock(side_effect=ValueError("bad request"))
+
+        with patch('main.client', self.fake_client(create)), pytest.raises(ValueError):
+            asyncio.run(main._create_completion(model="gpt-4o-mini"))
+
+        assert create.call_count == 1
+
+
+# =========================
+# Test the ReAct loop
+# =========================
+
+class TestReactLoop:
+    """Tests for Agent.run and the tool-calling loop."""
+
+    def test_answer_without_tools(self):
+        """Test that a reply without tool calls is the final answer."""
+        agent, requests_sent = scripted_agent([{"role": "assistant", "content": "40"}])
+
+        assert asyncio.run(agent.run("What is 25% of 160?")) == "40"
+        assert len(requests_sent) == 1
+
+    def test_tool_results_are_fed_back(self):
+        """Test that each tool call is answered by a tool message with its id."""
+        agent, requests_sent = scripted_agent([
+            {"role": "assistant", "content": None, "tool_calls": [tool_call("c1", "calculator", '{"expression": "2 * 3"}')]},
+            {"role": "assistant", "content": "6"},
+        ])
+
+        assert asyncio.run(agent.run("What is 2 * 3?")) == "6"
+        assert requests_sent[1][-1] == {"role": "tool", "tool_call_id": "c1", "content": "result of 2 * 3"}
+
+    def test_unknown_tool_becomes_error_observation(self):
+        """Test that a call to a tool that doesn't exist is reported back to the model."""
+        agent, requests_sent = scripted_agent([
+            {"role": "assistant", "content": None, "tool_calls": [tool_call("c1", "no_such_tool", "{}")]},
+            {"role": "assistant", "content": "Sorry"},
+        ])
+
+        asyncio.run(agent.run("Do something"))
+
+        assert "Unknown action: no_such_tool" in requests_sent[1][-1]["content"]
+
+    def test_max_turns(self):
+        """Test that the loop stops after max_turns rounds of tool calls."""
+        calls = {"role": "assistant", "content": None, "tool_calls": [tool_call("c1", "calculator", '{"expression": "1"}')]}
+        agent, requests_sent = scripted_agent([calls] * 3)
+
+        result = asyncio.run(agent.run("Loop forever", max_turns=2))
+
+        assert result == "Agent reached maximum turns without a final answer."
+        assert len(requests_sent) == 2
+
+
+# =========================
+# Test the context window
+# =========================
+
+class TestContextWindow:
+    """Tests for the sliding window applied by Agent._prune_context."""
+
+    @pytest.mark.parametrize("parallel_calls", [1, 2, 3, 5])
+    def test_long_run_keeps_requests_valid(self, parallel_calls):
+        """Test that a run outgrowing max_context_msgs never sends an invalid conversation."""
+        replies = [
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    tool_call(f"t{turn}c{n}", "calculator", f'{{"expression": "{turn} + {n}"}}')
+                    for n in range(parallel_calls)
+                ]
+            }
+            for turn in range(4)
+        ] + [{"role": "assistant", "content": "done"}]
+        agent, requests_sent = scripted_agent(replies, max_context_msgs=12)
+
+        assert asyncio.run(agent.run("Add some numbers", max_turns=10)) == "done"
+
+        for messages in requests_sent:
+            assert_valid_request(messages)
+            assert {"role": "user", "content": "Add some numbers"} in messages
+        assert {"role": "user", "content": "Add some numbers"} in agent.messages
+
+    def test_deduplication_survives_eviction(self):
+        """Test that repeated observations are sent once, and references never outlive their original."""
+        page = "the same long page " * 25
+        async def scrape(url):
+            return page
+        replies = [
+            {"role": "assistant", "content": None, "tool_calls": [tool_call(f"c{n}", "scrape_content", f'{{"url": "https://example.com/{n}"}}')]}
+            for n in range(6)
+        ] + [{"role": "assistant", "content": "done"}]
+        agent, requests_sent = scripted_agent(replies, max_context_msgs=6)
+
+        with patch.dict(main._async_actions, {"scrape_content": scrape}):
+            assert asyncio.run(agent.run("Read the pages", max_turns=10)) == "done"
+
+        for messages in requests_sent[1:]:
+            assert_valid_request(messages)
+            tool_messages = [message for message in messages if message["role"] == "tool"]
+            assert [message["content"] for message in tool_messages].count(page) == 1
+            ids = {message["tool_call_id"] for message in tool_messages if message["content"] == page}
+            for message in tool_messages:
+                if message["content"] != page:
+                    assert message["content"] in {main._observation_reference(call_id) for call_id in ids}
+
+    def test_window_is_bounded(self):
+        """Test that old turns are evicted while the system messages stay pinned."""
+        agent, _ = scripted_agent([{"role": "assistant", "content": f"answer {n}"} for n in range(10)], max_context_msgs=4)
+
+        for n in range(10):
+            asyncio.run(agent(f"question {n}"))
+
+        assert agent.messages[0]["content"] == "You are a test agent."
+        assert agent.messages[2:] == [
+            {"role": "user", "content": "question 8"},
+            {"role": "assistant", "content": "answer 8"},
+            {"role": "user", "content": "question 9"},
+            {"role": "assistant", "content": "answer 9"},
+        ]
+
+
+# =========================
+# Test the output limit
+# =========================
+
+class FakeCompletion:
+    """A non-streamed chat completion with a single choice."""
+
+    def __init__(self, message, finish_reason):
+        self.choices = [FakeChoice(message, finish_reason)]
+
+
+class FakeChoice:
+    def __init__(self, message, finish_reason):
+        self.message = FakeMessage(message)
+        self.finish_reason = finish_reason
+
+
+class FakeMessage:
+    def __init__(self, message):
+        self._message = message
+
+    def model_dump(self):
+        return self._message
+
+
+class TestOutputLimit:
+    """Tests for max_tokens and replies cut off by it."""
+
+    def test_default_limit_depends_on_model(self):
+        """Test that reasoning models aren't capped by default and other models are."""
+        assert Agent(model="gpt-5-mini").max_tokens is None
+        assert Agent(model="gpt-4o-mini").max_tokens == main.DEFAULT_MAX_TOKENS
+        assert Agent(model="gpt-5-mini", max_tokens=2000)._request()["max_completion_tokens"] == 2000
+        assert "max_completion_tokens" not in Agent(model="gpt-4o-mini", max_tokens=None)._request()
+
+    @patch('main._create_completion')
+    def test_truncated_reply_is_an_error(self, mock_create):
+        """Test that a reply cut off by max_tokens is reported as an error and not cached."""
+        mock_create.return_value = FakeCompletion({"role": "assistant", "content": ""}, "length")
+        agent = Agent(model="gpt-4o-mini", temperature=0, stream=False)
+
+        result = asyncio.run(agent.run("Explain everything"))
+
+        assert result.startswith("Error during API call")
+        assert "max_tokens" in result
+        assert agent._cache == {}
+
+    @patch('main._create_completion')
+    def test_complete_reply_is_cached(self, mock_create):
+        """Test that a normally finished deterministic reply is cached."""
+        mock_create.return_value = FakeCompletion({"role": "assistant", "content": "42"}, "stop")
+        agent = Agent(model="gpt-4o-mini", temperature=0, stream=False)
+
+        assert asyncio.run(agent.run("Answer")) == "42"
+        assert len(agent._cache) == 1
+
+    @patch('main._create_completion')
+    def test_truncated_stream_is_an_error(self, mock_create):
+        """Test that a streamed tool call cut off mid-arguments isn't run."""
+        async def stream():
+            fragment = SimpleNamespace(index=0, id="c1", function=SimpleNamespace(name="calculator", arguments='{"expr'))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=[fragment]), finish_reason=None)])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=None), finish_reason="length")])
+        mock_create.return_value = stream()
+        agent = Agent(model="gpt-4o-mini")
+
+        reply = asyncio.run(agent.execute())
+
+        assert "tool_calls" not in reply
+        assert reply["content"].startswith("Error during API call")
+
+
+# =========================
+# Test the response cache
+# =========================
+
+class TestResponseCache:
+    """Tests for the on-disk response cache (cache_path)."""
+
+    @patch('main._create_completion')
+    def test_unwritable_cache_is_skipped(self, mock_create, tmp_path):
+        """Test that a cache file that can't be written doesn't fail the run."""
+        mock_create.return_value = FakeCompletion({"role": "assistant", "content": "42"}, "stop")
+        agent = Agent(model="gpt-4o-mini", temperature=0, stream=False, cache_path=str(tmp_path / "missing" / "cache.json"))
+
+        assert asyncio.run(agent.run("Answer")) == "42"
+        assert len(agent._cache) == 1
+
+    def test_corrupt_cache_starts_empty(self, tmp_path):
+        """Test that a truncated cache file is ignored instead of failing the constructor."""
+        cache_path = tmp_path / "cache.json"
+        cache_path.write_bytes(b'{"abc": {"role": "assis')
+
+        assert Agent(temperature=0, cache_path=str(cache_path))._cache == {}
+
+    @patch('main._create_completion')
+    def test_agents_sharing_a_file_keep_each_others_entries(self, mock_create, tmp_path):
+        """Test that agents loaded before each other's writes don't overwrite each other's entries."""
+        mock_create.return_value = FakeCompletion({"role": "assistant", "content": "42"}, "stop")
+        cache_path = str(tmp_path / "cache.json")
+        first = Agent(model="gpt-4o-mini", temperature=0, stream=False, cache_path=cache_path)
+        second = Agent(model="gpt-4o-mini", temperature=0, stream=False, cache_path=cache_path)
+
+        asyncio.run(first.run("Question one"))
+        asyncio.run(second.run("Question two"))
+
+        reloaded = Agent(model="gpt-4o-mini", temperature=0, stream=False, cache_path=cache_path)
+        assert len(reloaded._cache) == 2
+        assert list(tmp_path.iterdir()) == [tmp_path / "cache.json"]
+
+
+# =========================
+# Test the semantic cache
+# =========================
+
+def unit(*components):
+    """Returns a unit-length float32 vector."""
+    vector = np.asarray(components, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class TestSemanticCache:
+    """Tests for the semantic observation cache in Agent.run_action."""
+
+    def run_searches(self, embeddings, results, queries, **agent_kwargs):
+        """
+        Runs search_internet for each query with _embed returning the given vectors in order,
+        and returns the observations and the queries the tool was actually called with.
+        """
+        searched = []
+        results = iter(results)
+
+        async def search(query):
+            searched.append(query)
+            return next(results)
+
+        agent = Agent(semantic_cache=True, **agent_kwargs)
+        with patch.dict(main._async_actions, {"search_internet": search}), \
+                patch.object(Agent, "_embed", AsyncMock(side_effect=embeddings)):
+            observations = [asyncio.run(agent.run_action("search_internet", query)) for query in queries]
+        return observations, searched
+
+    def test_similar_query_is_reused(self):
+        """Test that a query at least SEMANTIC_CACHE_THRESHOLD similar reuses the observation."""
+        observations, searched = self.run_searches(
+            [unit(1, 0), unit(1, 0.3)], ["Paris"], ["capital of France", "France's capital city"]
+        )
+
+        assert observations == ["Paris", "Paris"]
+        assert searched == ["capital of France"]
+
+    def test_different_query_is_searched(self):
+        """Test that a query below the threshold runs the tool again."""
+        observations, searched = self.run_searches(
+            [unit(1, 0), unit(1, 1)], ["Paris", "Berlin"], ["capital of France", "capital of Germany"]
+        )
+
+        assert observations == ["Paris", "Berlin"]
+        assert searched == ["capital of France", "capital of Germany"]
+
+    def test_errors_are_not_cached(self):
+        """Test that a failed search is retried instead of being reused."""
+        observations, searched = self.run_searches(
+            [unit(1, 0), unit(1, 0)], ["Error: timeout", "Paris"], ["capital of France", "capital of France"]
+        )
+
+        assert observations == ["Error: timeout", "Paris"]
+        assert len(searched) == 2
+
+    def test_embedding_failure_runs_the_tool(self):
+        """Test that the tool still runs when the embedding call fails."""
+        observations, searched = self.run_searches(
+            [None, None], ["Paris", "Paris"], ["capital of France", "capital of France"]
+        )
+
+        assert observations == ["Paris", "Paris"]
+        assert len(searched) == 2
+
+    def test_other_actions_are_not_cached(self):
+        """Test that only SEMANTIC_CACHE_ACTIONS are matched by meaning."""
+        with patch.object(Agent, "_embed", AsyncMock()) as mock_embed:
+            agent = Agent(semantic_cache=True)
+            assert asyncio.run(agent.run_action("calculator", "2 + 2")) == "result of 2 + 2"
+
+        mock_embed.assert_not_called()
+
+
+# =========================
+# Test the Batch API
+# =========================
+
+def batch_record(custom_id, message, finish_reason="stop", status_code=200):
+    """Builds one line of a batch output file."""
+    body = {"choices": [{"message": message, "finish_reason": finish_reason}]}
+    return orjson.dumps({"custom_id": custom_id, "response": {"status_code": status_code, "body": body}}).decode()
+
+
+def fake_batch_client(status, records=()):
+    """Returns a client whose batch ends with status and whose output file holds records."""
+    return SimpleNamespace(
+        files=SimpleNamespace(
+            create=AsyncMock(return_value=SimpleNamespace(id="file-in")),
+            content=AsyncMock(return_value=SimpleNamespace(text="\n".join(records))),
+        ),
+        batches=SimpleNamespace(
+            create=AsyncMock(return_value=SimpleNamespace(id="batch-1", status="validating")),
+            retrieve=AsyncMock(return_value=SimpleNamespace(id="batch-1", status=status, output_file_id="file-out")),
+        ),
+    )
+
+
+class TestRunBatch:
+    """Tests for Agent.run_batch."""
+
+    @patch('main._create_completion')
+    def test_completed_batch(self, mock_create):
+        """Test that answers are returned as is and tool calls continue with regular API calls."""
+        mock_create.return_value = FakeCompletion({"role": "assistant", "content": "6"}, "stop")
+        fake_client = fake_batch_client("completed", [
+            batch_record("1", {"role": "assistant", "content": None, "tool_calls": [tool_call("c1", "calculator", '{"expression": "2 * 3"}')]}),
+            batch_record("0", {"role": "assistant", "content": "40"}),
+        ])
+        agent = Agent(system="You are a test agent.")
+
+        with patch('main.client', fake_client):
+            answers = asyncio.run(agent.run_batch(["What is 25% of 160?", "What is 2 * 3?"], poll_interval=0))
+
+        assert answers == ["40", "6"]
+        lines = fake_client.files.create.call_args.kwargs["file"][1].splitlines()
+        requests = [orjson.loads(line) for line in lines]
+        assert [request["custom_id"] for request in requests] == ["0", "1"]
+        assert requests[1]["body"]["messages"][-1] == {"role": "user", "content": "What is 2 * 3?"}
+        # The follow-up turn carries the tool result, without streaming
+        # (the request's message list is the fork's own, which has the final answer appended since)
+        follow_up = mock_create.call_args.kwargs
+        assert "stream" not in follow_up
+        assert follow_up["messages"][-2] == {"role": "tool", "tool_call_id": "c1", "content": "result of 2 * 3"}
+        # The original agent's conversation is untouched
+        assert agent.messages[-1]["role"] == "system"
+
+    @pytest.mark.parametrize("status", ["failed", "expired"])
+    def test_unfinished_batch(self, status):
+        """Test that a batch that didn't complete fails every prompt."""
+        with patch('main.client', fake_batch_client(status)):
+            answers = asyncio.run(Agent().run_batch(["a", "b"], poll_interval=0))
+
+        assert answers == [f"Error during batch API call: batch batch-1 {status}"] * 2
+
+    def test_missing_and_failed_records(self):
+        """Test that prompts without a successful record fail on their own."""
+        fake_client = fake_batch_client("completed", [
+            batch_record("0", {"role": "assistant", "content": "fine"}),
+            batch_record("1", {"role": "assistant", "content": "ignored"}, status_code=500),
+        ])
+
+        with patch('main.client', fake_client):
+            answers = asyncio.run(Agent().run_batch(["a", "b", "c"], poll_interval=0))
+
+        assert answers == [
+            "fine",
+            "Error during batch API call: no response for prompt 1",
+            "Error during batch API call: no response for prompt 2",
+        ]
+
+    def test_truncated_record(self):
+        """Test that a reply cut off by max_tokens is treated as failed."""
+        fake_client = fake_batch_client("completed", [
+            batch_record("0", {"role": "assistant", "content": None, "tool_calls": [tool_call("c1", "calculator", '{"expr')]}, finish_reason="length"),
+        ])
+
+        with patch('main.client', fake_client):
+            answers = asyncio.run(Agent().run_batch(["a"], poll_interval=0))
+
+        assert answers == ["Error during batch API call: no response for prompt 0"]
+
+
+# =========================
+# Test concurrent runs
+# =========================
+
+class TestRunMany:
+    """Tests for run_many."""
+
+    def test_answers_in_order_without_streaming(self):
+        """Test that every prompt gets its own non-streaming agent and answers keep their order."""
+        async def execute(agent):
+            assert agent.stream is False
+            return {"role": "assistant", "content": f"answer to {agent.messages[-1]['content']}"}
+
+        with patch.object(Agent, "execute", autospec=True, side_effect=execute):
+            answers = asyncio.run(main.run_many(["a", "b", "c"], system="s", stream=True))
+
+        assert answers == ["answer to a", "answer to b", "answer to c"]
@@ -1,18 +1,41 @@
 import pytest
 import os
+import zipfile
 from unittest.mock import patch, mock_open, MagicMock
+import orjson
 import requests
+import tools
 from tools import (
     calculator,
     search_internet,
     scrape_content,
+    scrape_many,
     get_weather,
     read_file_content,
     write_file_content,
-    _parse_file_args
+    _parse_file_args,
+    _normalize_url,
+    known_actions,
+    tool_schemas,
+    format_action_input
 )
 
 
+@pytest.fixture(autouse=True)
+def isolated_scrape_cache(tmp_path):
+    """Points the persistent scrape cache at a fresh directory, and empties its in-memory copy, for every test."""
+    tools._MEMORY_SCRAPE_CACHE.clear()
+    with patch('tools.SCRAPE_CACHE_DIR', str(tmp_path / "scrape_cache")):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    """Starts every test without cached search and weather results."""
+    tools._RESPONSE_CACHE.clear()
+    yield
+
+
 # =========================
 # Test _parse_file_args Helper
 # =========================
@@ -54,6 +77,31 @@ class TestParseFileArgs:
             _parse_file_args(input_str)
 
 
+# =========================
+# Test Tool Schemas
+# =========================
+
+class TestToolSchemas:
+    """Tests for the tool schemas sent to the model and format_action_input."""
+    
+    def test_every_action_has_a_schema(self):
+        """Test that the schemas describe exactly the registered tools."""
+        names = [schema["function"]["name"] for schema in tool_schemas]
+        assert sorted(names) == sorted(known_actions)
+    
+    def test_single_argument(self):
+        """Test that a single-argument tool gets the argument value itself."""
+        assert format_action_input("get_weather", {"location": "Tokyo"}) == "Tokyo"
+        assert format_action_input("scrape_many", {"urls": ["https://a.com/x?ids=1,2"]}) == ["https://a.com/x?ids=1,2"]
+    
+    def test_write_file_arguments_round_trip(self):
+        """Test that write_file_content arguments are formatted for _parse_file_args."""
+        action_input = format_action_input(
+            "write_file_content", {"file_path": "notes.txt", "content": 'He said "hi"\nBye'}
+        )
+        assert _parse_file_args(action_input) == ("notes.txt", 'He said "hi"\nBye')
+
+
 # =========================
 # Test calculator
 # =========================
@@ -98,13 +146,49 @@ class TestCalculator:
     
     def test_invalid_expression(self):
         """Test that invalid expression returns error message."""
-        result = calculator("2 + + 2")
+        result = calculator("2 + * 2")
         assert "Error evaluating expression" in result
     
     def test_division_by_zero(self):
         """Test division by zero returns error."""
         result = calculator("5 / 0")
         assert "Error evaluating expression" in result
+    
+    def test_negative_and_modulo(self):
+        """Test unary minus and modulo."""
+        assert calculator("-7 % 3") == "2"
+    
+    def test_unary_plus(self):
+        """Test that unary plus is accepted, as Python's own arithmetic does."""
+        assert calculator("+5") == "5"
+        assert calculator("2 * +3") == "6"
+        assert calculator("2 + + 2") == "4"
+    
+    def test_complex_result(self):
+        """Test that a fractional power of a negative number is refused instead of returning a complex number."""
+        assert "not a real number" in calculator("(-8) ** (1/3)")
+        assert calculator("(-8) ** 2") == "64"
+    
+    def test_rejects_python_code(self):
+        """Test that names and function calls are not evaluated."""
+        result = calculator("__import__('os').getcwd()")
+        assert "Error evaluating expression" in result
+    
+    def test_huge_exponent(self):
+        """Test that runaway powers are refused instead of computed."""
+        result = calculator("9 ** 9 ** 9")
+        assert "Error evaluating expression" in result
+    
+    def test_huge_nested_power(self):
+        """Test that a power of an already huge number is refused before it is computed."""
+        for expression in ["(9 ** 9999) ** 999", "(9 ** 9999) ** 9999", "(2 ** 10000) * (2 ** 10000)"]:
+            assert "too large" in calculator(expression)
+    
+    def test_large_but_reasonable_results(self):
+        """Test that big integers within the limit and float overflows still behave."""
+        assert calculator("2 ** 1000") == str(2 ** 1000)
+        assert calculator("2 ** -2") == "0.25"
+        assert "Error evaluating expression" in calculator("2.0 ** 100000")
 
 
 # =========================
@@ -114,12 +198,12 @@ class TestCalculator:
 class TestSearchInternet:
     """Tests for the search_internet function."""
     
-    @patch('tools.requests.post')
+    @patch('tools._SESSION.post')
     @patch.dict(os.environ, {'SERPER_API_KEY': 'test_api_key'})
     def test_successful_search(self, mock_post):
         """Test successful internet search with results."""
         mock_response = MagicMock()
-        mock_response.json.return_value = {
+        mock_response.content = orjson.dumps({
             "organic": [
                 {
                     "title": "Test Result 1",
@@ -132,7 +216,7 @@ class TestSearchInternet:
                     "link": "https://example.com/2"
                 }
             ]
-        }
+        })
         mock_response.raise_for_status = MagicMock()
         mock_post.return_value = mock_response
         
@@ -143,13 +227,14 @@ class TestSearchInternet:
         assert "https://example.com/1" in result
         assert "This is a test snippet 1" in result
         mock_post.assert_called_once()
+        assert orjson.loads(mock_post.call_args[1]['data']) == {"q": "test query", "num": 5}
     
-    @patch('tools.requests.post')
+    @patch('tools._SESSION.post')
     @patch.dict(os.environ, {'SERPER_API_KEY': 'test_api_key'})
     def test_no_results_found(self, mock_post):
         """Test when no search results are returned."""
         mock_response = MagicMock()
-        mock_response.json.return_value = {"organic": []}
+        mock_response.content = orjson.dumps({"organic": []})
         mock_response.raise_for_status = MagicMock()
         mock_post.return_value = mock_response
         
@@ -157,12 +242,12 @@ class TestSearchInternet:
         
         assert "No relevant information" in result
     
-    @patch('tools.requests.post')
+    @patch('tools._SESSION.post')
     @patch.dict(os.environ, {'SERPER_API_KEY': 'test_api_key'})
     def test_missing_organic_key(self, mock_post):
         """Test when API response doesn't have organic results."""
         mock_response = MagicMock()
-        mock_response.json.return_value = {}
+        mock_response.content = orjson.dumps({})
         mock_response.raise_for_status = MagicMock()
         mock_post.return_value = mock_response
         
@@ -170,13 +255,28 @@ class TestSearchInternet:
         
         assert "No relevant information" in result
     
+    @patch('tools._SESSION.post')
+    @patch.dict(os.environ, {'SERPER_API_KEY': 'test_api_key'})
+    def test_repeat_search_uses_cache(self, mock_post):
+        """Test that repeating a search (ignoring case and spacing) doesn't call the API again."""
+        mock_response = MagicMock()
+        mock_response.content = orjson.dumps({"organic": [{"title": "T", "snippet": "S", "link": "https://example.com"}]})
+        mock_response.raise_for_status = MagicMock()
+        mock_post.return_value = mock_response
+        
+        first = search_internet("Gold price")
+        second = search_internet("  gold   PRICE ")
+        
+        assert first == second
+        mock_post.assert_called_once()
+    
     @patch.dict(os.environ, {}, clear=True)
     def test_missing_api_key(self):
         """Test when SERPER_API_KEY is not set."""
         result = search_internet("test query")
         assert "SERPER_API_KEY not found" in result
     
-    @patch('tools.requests.post')
+    @patch('tools._SESSION.post')
     @patch.dict(os.environ, {'SERPER_API_KEY': 'test_api_key'})
     def test_request_exception(self, mock_post):
         """Test handling of request exceptions."""
@@ -186,7 +286,7 @@ class TestSearchInternet:
         
         assert "Error making request to Serper API" in result
     
-    @patch('tools.requests.post')
+    @patch('tools._SESSION.post')
     @patch.dict(os.environ, {'SERPER_API_KEY': 'test_api_key'})
     def test_http_error(self, mock_post):
         """Test handling of HTTP errors."""
@@ -206,7 +306,7 @@ class TestSearchInternet:
 class TestScrapeContent:
     """Tests for the scrape_content function."""
     
-    @patch('tools.requests.get')
+    @patch('tools._SESSION.get')
     def test_successful_scrape(self, mock_get):
         """Test successful content scraping."""
         html_content = """
@@ -223,7 +323,8 @@ class TestScrapeContent:
         </html>
         """
         mock_response = MagicMock()
-        mock_response.content = html_content.encode('utf-8')
+        mock_response.iter_content.return_value = [html_content.encode('utf-8')]
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
         mock_response.raise_for_status = MagicMock()
         mock_get.return_value = mock_response
         
@@ -235,12 +336,13 @@ class TestScrapeContent:
         assert "Header content" not in result  # Headers should be removed
         assert "Footer content" not in result  # Footers should be removed
     
-    @patch('tools.requests.get')
+    @patch('tools._SESSION.get')
     def test_content_truncation(self, mock_get):
         """Test that content is truncated to 8000 characters."""
         long_content = "<html><body>" + "a" * 10000 + "</body></html>"
         mock_response = MagicMock()
-        mock_response.content = long_content.encode('utf-8')
+        mock_response.iter_content.return_value = [long_content.encode('utf-8')]
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
         mock_response.raise_for_status = MagicMock()
         mock_get.return_value = mock_response
         
@@ -248,7 +350,7 @@ class TestScrapeContent:
         
         assert len(result) <= 8000
     
-    @patch('tools.requests.get')
+    @patch('tools._SESSION.get')
     def test_http_error(self, mock_get):
         """Test handling of HTTP errors."""
         mock_response = MagicMock()
@@ -260,7 +362,7 @@ class TestScrapeContent:
         assert "Error retrieving content" in result
         assert "HTTP Status Code" in result
     
-    @patch('tools.requests.get')
+    @patch('tools._SESSION.get')
     def test_connection_error(self, mock_get):
         """Test handling of connection errors."""
         mock_get.side_effect = requests.exceptions.ConnectionError("Connection refused")
@@ -269,7 +371,7 @@ class TestScrapeContent:
         
         assert "Error connecting to URL" in result
     
-    @patch('tools.requests.get')
+    @patch('tools._SESSION.get')
     def test_timeout_error(self, mock_get):
         """Test handling of timeout errors."""
         mock_get.side_effect = requests.exceptions.Timeout("Request timed out")
@@ -278,11 +380,56 @@ class TestScrapeContent:
         
         assert "Error connecting to URL" in result
     
-    @patch('tools.requests.get')
+    @patch('tools._SESSION.get')
+    def test_head_is_ignored(self, mock_get):
+        """Test that only the text of <body> is returned."""
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = [b"<html><head><title>Title</title></head><body><noscript>Enable JS</noscript>Body text</body></html>"]
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.raise_for_status = MagicMock()
+        mock_get.return_value = mock_response
+        
+        assert scrape_content("https://example.com") == "Body text"
+    
+    @patch('tools._SESSION.get')
+    def test_adjacent_elements_are_separated(self, mock_get):
+        """Test that text of adjacent elements isn't glued together."""
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = [b"<html><body><p>First</p><p>Second</p><script>x</script>Tail</body></html>"]
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.raise_for_status = MagicMock()
+        mock_get.return_value = mock_response
+        
+        assert scrape_content("https://example.com") == "First Second Tail"
+    
+    @patch('tools._SESSION.get')
+    def test_declared_charset(self, mock_get):
+        """Test that the charset from the Content-Type header is used to decode the page."""
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = ["<html><body>Café</body></html>".encode('iso-8859-1')]
+        mock_response.headers = {"Content-Type": "text/html; charset=ISO-8859-1"}
+        mock_response.raise_for_status = MagicMock()
+        mock_get.return_value = mock_response
+        
+        assert scrape_content("https://example.com") == "Café"
+    
+    @patch('tools._SESSION.get')
+    def test_unknown_declared_charset(self, mock_get):
+        """Test that a charset Python doesn't know falls back to lxml's own detection."""
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = ['<html><head><meta charset="utf-8"></head><body>Café</body></html>'.encode('utf-8')]
+        mock_response.headers = {"Content-Type": "text/html; charset=utf8mb4"}
+        mock_response.raise_for_status = MagicMock()
+        mock_get.return_value = mock_response
+        
+        assert scrape_content("https://example.com") == "Café"
+    
+    @patch('tools._SESSION.get')
     def test_user_agent_header(self, mock_get):
         """Test that custom User-Agent header is sent."""
         mock_response = MagicMock()
-        mock_response.content = b"<html><body>Test</body></html>"
+        mock_response.iter_content.return_value = [b"<html><body>Test</body></html>"]
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
         mock_response.raise_for_status = MagicMock()
         mock_get.return_value = mock_response
         
@@ -293,6 +440,183 @@ class TestScrapeContent:
         assert 'headers' in call_args[1]
         assert 'User-Agent' in call_args[1]['headers']
 
+    @patch('tools._SESSION.get')
+    def test_repeat_scrape_uses_cache(self, mock_get):
+        """Test that a second scrape of the same page is served from the cache."""
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = [b"<html><body>Cached page</body></html>"]
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.raise_for_status = MagicMock()
+        mock_get.return_value = mock_response
+        
+        first = scrape_content("https://example.com/page?utm_source=news#intro")
+        second = scrape_content("https://example.com/page")
+        
+        assert first == second == "Cached page"
+        mock_get.assert_called_once()
+    
+    @patch('tools._SESSION.get')
+    def test_repeat_scrape_served_from_memory(self, mock_get, tmp_path):
+        """Test that a page scraped in this session is served from memory even if its cache file is gone."""
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = [b"<html><body>Cached page</body></html>"]
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.raise_for_status = MagicMock()
+        mock_get.return_value = mock_response
+        
+        scrape_content("https://example.com/page")
+        for cache_file in (tmp_path / "scrape_cache").iterdir():
+            cache_file.unlink()
+        
+        assert scrape_content("https://example.com/page") == "Cached page"
+        mock_get.assert_called_once()
+    
+    @patch('tools._SESSION.get')
+    def test_errors_are_not_cached(self, mock_get):
+        """Test that a failed scrape is retried on the next call."""
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = [b"<html><body>Recovered</body></html>"]
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.raise_for_status = MagicMock()
+        mock_get.side_effect = [requests.exceptions.ConnectionError("Connection refused"), mock_response]
+        
+        assert "Error connecting to URL" in scrape_content("https://example.com")
+        assert scrape_content("https://example.com") == "Recovered"
+    
+    @patch('tools._SESSION.get')
+    def test_non_html_is_not_downloaded(self, mock_get):
+        """Test that a PDF or other binary is rejected from its headers alone."""
+        mock_response = MagicMock()
+        mock_response.headers = {"Content-Type": "application/pdf"}
+        mock_response.raise_for_status = MagicMock()
+        mock_get.return_value = mock_response
+        
+        result = scrape_content("https://example.com/report.pdf")
+        
+        assert "not a web page" in result
+        assert "application/pdf" in result
+        mock_response.iter_content.assert_not_called()
+        mock_response.close.assert_called_once()
+    
+    @patch('tools._SESSION.get')
+    @patch('tools.MAX_PAGE_BYTES', 100)
+    def test_download_is_capped(self, mock_get):
+        """Test that reading stops once MAX_PAGE_BYTES have arrived."""
+        chunks_read = []
+        def chunks(chunk_size):
+            for i in range(100):
+                chunks_read.append(i)
+                yield b"<p>" + b"x" * 60 + b"</p>"
+        mock_response = MagicMock()
+        mock_response.iter_content.side_effect = chunks
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.raise_for_status = MagicMock()
+        mock_get.return_value = mock_response
+        
+        result = scrape_content("https://example.com")
+        
+        assert len(chunks_read) == 2
+        assert mock_get.call_args[1]['stream'] is True
+        mock_response.close.assert_called_once()
+        assert result.startswith("x" * 60)
+    
+    @patch('tools._SESSION.get')
+    @patch('tools.SCRAPE_CACHE_TTL', 0)
+    def test_cache_disabled(self, mock_get):
+        """Test that a TTL of 0 disables the cache."""
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = [b"<html><body>Fresh</body></html>"]
+        mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+        mock_response.raise_for_status = MagicMock()
+        mock_get.return_value = mock_response
+        
+        scrape_content("https://example.com")
+        scrape_content("https://example.com")
+        
+        assert mock_get.call_count == 2
+    
+    def test_expired_entry_is_deleted_when_read(self):
+        """Test that reading an expired page removes its cache file."""
+        tools._write_scrape_cache("https://example.com/old", "Old page")
+        path = tools._scrape_cache_path("https://example.com/old")
+        
+        with patch('tools.time.time', return_value=tools.time.time() + tools.SCRAPE_CACHE_TTL + 1):
+            assert tools._read_scrape_cache("https://example.com/old") is None
+        
+        assert not os.path.exists(path)
+    
+    def test_write_prunes_the_cache(self):
+        """Test that writing a page deletes expired pages and the oldest beyond SCRAPE_CACHE_MAX_ENTRIES."""
+        urls = [f"https://example.com/{n}" for n in range(5)]
+        now = tools.time.time()
+        for n, url in enumerate(urls[:4]):
+            tools._write_scrape_cache(url, f"Page {n}")
+            fetched_at = now - tools.SCRAPE_CACHE_TTL - 10 if n == 0 else now - 100 + n
+            os.utime(tools._scrape_cache_path(url), (fetched_at, fetched_at))
+        
+        with patch('tools.SCRAPE_CACHE_MAX_ENTRIES', 3):
+            tools._write_scrape_cache(urls[4], "Page 4")
+        
+        assert [os.path.exists(tools._scrape_cache_path(url)) for url in urls] == [False, False, True, True, True]
+    
+    def test_normalize_url(self):
+        """Test that fragments and utm_* parameters don't change the cache key."""
+        assert _normalize_url("HTTPS://Example.com/a?id=1&utm_medium=email#top") == "https://example.com/a?id=1"
+
+
+# =========================
+# Test scrape_many
+# =========================
+
+class TestScrapeMany:
+    """Tests for the scrape_many function."""
+    
+    @patch('tools.scrape_content')
+    def test_results_in_input_order(self, mock_scrape):
+        """Test that every URL is scraped once and reported under its own heading, in order."""
+        mock_scrape.side_effect = lambda url: f"text of {url}"
+        
+        result = scrape_many(["https://a.com", " https://b.com", "https://a.com"])
+        
+        assert result == "=== https://a.com ===\ntext of https://a.com\n\n=== https://b.com ===\ntext of https://b.com"
+        assert mock_scrape.call_count == 2
+    
+    @patch('tools.scrape_content')
+    def test_failures_are_reported_per_url(self, mock_scrape):
+        """Test that one failing page doesn't hide the others."""
+        mock_scrape.side_effect = lambda url: "Error connecting to URL: refused" if "bad" in url else "Good page"
+        
+        result = scrape_many(["https://bad.com", "https://good.com"])
+        
+        assert "=== https://bad.com ===\nError connecting to URL" in result
+        assert "=== https://good.com ===\nGood page" in result
+    
+    @patch('tools.scrape_content')
+    def test_url_with_comma(self, mock_scrape):
+        """Test that a URL containing a comma is fetched as one URL."""
+        mock_scrape.return_value = "Page"
+        
+        scrape_many(["https://a.com/x?ids=1,2"])
+        
+        mock_scrape.assert_called_once_with("https://a.com/x?ids=1,2")
+    
+    @patch('tools.scrape_content')
+    def test_url_count_and_output_are_capped(self, mock_scrape):
+        """Test that extra URLs are skipped and the pages share one MAX_OUTPUT_CHARS budget."""
+        mock_scrape.return_value = "y" * 8000
+        urls = [f"https://example.com/{n}" for n in range(7)]
+        
+        result = scrape_many(urls)
+        
+        assert mock_scrape.call_count == 5
+        assert "Skipped 2 more URLs" in result
+        assert "https://example.com/6" in result
+        assert result.count("y") == 5 * (8000 // 5)
+    
+    def test_no_urls(self):
+        """Test that an empty list is an error."""
+        assert "Error" in scrape_many([" ", ""])
+
 
 # =========================
 # Test get_weather
@@ -301,19 +625,19 @@ class TestScrapeContent:
 class TestGetWeather:
     """Tests for the get_weather function."""
     
-    @patch('tools.requests.get')
+    @patch('tools._SESSION.get')
     @patch.dict(os.environ, {'WEATHER_API_KEY': 'test_weather_key'})
     def test_successful_weather_fetch(self, mock_get):
         """Test successful weather data retrieval."""
         mock_response = MagicMock()
-        mock_response.json.return_value = {
+        mock_response.content = orjson.dumps({
             "current": {
                 "temp_c": 22.5,
                 "condition": {
                     "text": "Partly cloudy"
                 }
             }
-        }
+        })
         mock_get.return_value = mock_response
         
         result = get_weather("Tokyo")
@@ -322,19 +646,32 @@ class TestGetWeather:
         assert "22.5" in result
         assert "Partly cloudy" in result
     
-    @patch('tools.requests.get')
+    @patch('tools._SESSION.get')
     @patch.dict(os.environ, {'WEATHER_API_KEY': 'test_weather_key'})
     def test_weather_not_found(self, mock_get):
         """Test when weather information is not available."""
         mock_response = MagicMock()
-        mock_response.json.return_value = {}
+        mock_response.content = orjson.dumps({})
         mock_get.return_value = mock_response
         
         result = get_weather("InvalidCity")
         
         assert "Weather information not found" in result
     
-    @patch('tools.requests.get')
+    @patch('tools._SESSION.get')
+    @patch.dict(os.environ, {'WEATHER_API_KEY': 'test_weather_key'})
+    def test_not_found_is_not_cached(self, mock_get):
+        """Test that a failed lookup is retried on the next call."""
+        mock_response = MagicMock()
+        mock_response.content = orjson.dumps({})
+        mock_get.return_value = mock_response
+        
+        get_weather("Tokyo")
+        get_weather("Tokyo")
+        
+        assert mock_get.call_count == 2
+    
+    @patch('tools._SESSION.get')
     @patch.dict(os.environ, {'WEATHER_API_KEY': 'test_weather_key'})
     def test_weather_api_error(self, mock_get):
         """Test handling of API errors."""
@@ -344,7 +681,7 @@ class TestGetWeather:
         
         assert "Error retrieving weather data" in result
     
-    @patch('tools.requests.get')
+    @patch('tools._SESSION.get')
     @patch.dict(os.environ, {'WEATHER_API_KEY': 'test_weather_key'})
     def test_weather_timeout(self, mock_get):
         """Test handling of timeout errors."""
@@ -391,6 +728,16 @@ class TestReadFileContent:
         assert "name,age" in result
         assert "John,30" in result
     
+    def test_read_large_txt_file_with_invalid_bytes(self, tmp_path):
+        """Test that a large text file is cut at MAX_OUTPUT_CHARS and bad bytes don't fail the read."""
+        file_path = tmp_path / "big.txt"
+        file_path.write_bytes(b"caf\xe9 " + b"a" * 100000)
+        
+        result = read_file_content(str(file_path))
+        
+        assert result.startswith("caf\ufffd a")
+        assert len(result) == 8000
+    
     @patch('os.path.isfile', return_value=True)
     def test_unsupported_file_type(self, mock_isfile):
         """Test handling of unsupported file types."""
@@ -404,7 +751,7 @@ class TestReadFileContent:
         result = read_file_content("protected.txt")
         assert "Permission denied" in result
     
-    @patch('tools.pdfplumber.open')
+    @patch('pdfplumber.open')
     @patch('os.path.isfile', return_value=True)
     def test_read_pdf_file(self, mock_isfile, mock_pdf):
         """Test reading a PDF file."""
@@ -417,22 +764,71 @@ class TestReadFileContent:
         result = read_file_content("test.pdf")
         assert "PDF content here" in result
     
-    @patch('tools.docx.Document')
+    @patch('pdfplumber.open')
     @patch('os.path.isfile', return_value=True)
-    def test_read_docx_file(self, mock_isfile, mock_doc):
-        """Test reading a DOCX file."""
-        mock_para1 = MagicMock()
-        mock_para1.text = "First paragraph"
-        mock_para2 = MagicMock()
-        mock_para2.text = "Second paragraph"
+    def test_read_pdf_with_scanned_page(self, mock_isfile, mock_pdf):
+        """Test that a page without a text layer doesn't break extraction."""
+        scanned_page = MagicMock()
+        scanned_page.extract_text.return_value = None
+        text_page = MagicMock()
+        text_page.extract_text.return_value = "Page two"
+        mock_pdf_context = MagicMock()
+        mock_pdf_context.__enter__.return_value.pages = [scanned_page, text_page]
+        mock_pdf.return_value = mock_pdf_context
         
-        mock_document = MagicMock()
-        mock_document.paragraphs = [mock_para1, mock_para2]
-        mock_doc.return_value = mock_document
+        assert read_file_content("test.pdf") == "Page two"
+    
+    @patch('pdfplumber.open')
+    @patch('tools.MAX_OUTPUT_CHARS', 100)
+    @patch('os.path.isfile', return_value=True)
+    def test_read_pdf_stops_at_limit(self, mock_isfile, mock_pdf):
+        """Test that pages after MAX_OUTPUT_CHARS characters aren't extracted."""
+        pages = [MagicMock() for _ in range(10)]
+        for page in pages:
+            page.extract_text.return_value = "x" * 60
+        mock_pdf_context = MagicMock()
+        mock_pdf_context.__enter__.return_value.pages = pages
+        mock_pdf.return_value = mock_pdf_context
         
-        result = read_file_content("test.docx")
-        assert "First paragraph" in result
-        assert "Second paragraph" in result
+        result = read_file_content("test.pdf")
+        
+        assert len(result) == 100
+        pages[1].extract_text.assert_called_once()
+        pages[2].extract_text.assert_not_called()
+    
+    def test_read_docx_file(self, tmp_path):
+        """Test reading a DOCX file, including paragraphs split over runs, tabs and line breaks."""
+        document_xml = (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            '<w:p><w:r><w:t>First paragraph</w:t></w:r></w:p>'
+            '<w:p><w:r><w:t xml:space="preserve">Second </w:t></w:r><w:r><w:rPr><w:b/></w:rPr><w:t>paragraph</w:t></w:r></w:p>'
+            '<w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>'
+            '<w:r><w:t>Name</w:t><w:tab/><w:t>Value</w:t><w:br/><w:t>Next line</w:t><w:br w:type="page"/><w:t>Last</w:t></w:r></w:p>'
+            '</w:body></w:document>'
+        )
+        file_path = tmp_path / "test.docx"
+        with zipfile.ZipFile(file_path, "w") as archive:
+            archive.writestr("word/document.xml", document_xml)
+        
+        result = read_file_content(str(file_path))
+        assert result == "First paragraph\nSecond paragraph\nName\tValue\nNext lineLast"
+
+    def test_read_docx_ignores_external_entities(self, tmp_path):
+        """Test that a crafted DOCX can't pull a local file into the output through an external entity."""
+        secret = tmp_path / "secret.txt"
+        secret.write_text("top secret")
+        document_xml = (
+            f'<!DOCTYPE w:document [<!ENTITY leak SYSTEM "{secret.as_uri()}">]>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            '<w:p><w:r><w:t>Before &leak; after</w:t></w:r></w:p>'
+            '</w:body></w:document>'
+        )
+        file_path = tmp_path / "test.docx"
+        with zipfile.ZipFile(file_path, "w") as archive:
+            archive.writestr("word/document.xml", document_xml)
+        
+        result = read_file_content(str(file_path))
+        assert "top secret" not in result
 
 
 # =========================
@@ -512,12 +908,12 @@ class TestIntegrationScenarios:
         write_result = write_file_content(f'"result.txt", "The answer is {calc_result}"')
         assert "Content written to result.txt successfully" in write_result
     
-    @patch('tools.requests.post')
+    @patch('tools._SESSION.post')
     @patch.dict(os.environ, {'SERPER_API_KEY': 'test_api_key'})
     def test_search_returns_urls_for_scraping(self, mock_post):
         """Test that search results include URLs that can be scraped."""
         mock_response = MagicMock()
-        mock_response.json.return_value = {
+        mock_response.content = orjson.dumps({
             "organic": [
                 {
                     "title": "Article Title",
@@ -525,7 +921,7 @@ class TestIntegrationScenarios:
                     "link": "https://example.com/article"
                 }
             ]
-        }
+        })
         mock_response.raise_for_status = MagicMock()
         mock_post.return_value = mock_response
         
@@ -1,21 +1,45 @@
-import os, re
+import ast, functools, hashlib, json, math, operator, os, re, threading, time, zipfile
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
-from typing import Union
-import requests, docx, pdfplumber
+from typing import Any, Dict, Iterable, List, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import orjson
+import requests
+from cachetools import LRUCache, TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
 
 _ = load_dotenv()
 WEATHER_API_KEY = os.environ.get("WEATHER_API_KEY")
 
+# Scraped pages are cached on disk so repeat visits (even across sessions) skip the download
+SCRAPE_CACHE_DIR = os.environ.get("SCRAPE_CACHE_DIR", ".scrape_cache")
+SCRAPE_CACHE_TTL = float(os.environ.get("SCRAPE_CACHE_TTL", 3600)) # Seconds, 0 disables the cache
+SCRAPE_CACHE_MAX_ENTRIES = int(os.environ.get("SCRAPE_CACHE_MAX_ENTRIES", 500)) # Oldest pages beyond this are deleted
+
+# Longest text a page or file is reduced to, to avoid overwhelming the LLM
+MAX_OUTPUT_CHARS = 8000
+
+# One shared session keeps connections alive, so repeat requests to a host skip the TCP/TLS handshake.
+# Failed connections are retried twice with backoff (urllib3 never retries a POST that reached the server)
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.3))
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
 # --- Helper Function to Parse Write Arguments ---
+# Regex to find two quoted strings, separated by a comma
+# re.DOTALL means '.' will match newlines, so content can span multiple lines
+_FILE_ARGS_RE = re.compile(r'\s*"(.*?)"\s*,\s*"(.*)"\s*$', re.DOTALL)
+
+
 def _parse_file_args(input_str: str) -> tuple[str, str]:
     """
     Parses the single-string input from the agent into (file_path, content).
     Expected format: "path/to/file.txt", "The content to write."
     """
-    # Regex to find two quoted strings, separated by a comma
-    # re.DOTALL means '.' will match newlines, so content can span multiple lines
-    match = re.match(r'\s*"(.*?)"\s*,\s*"(.*)"\s*$', input_str, re.DOTALL)
+    match = _FILE_ARGS_RE.match(input_str)
     
     if not match:
         raise ValueError("Invalid format. Expected: \"<file_path>\", \"<content>\"")
@@ -24,14 +48,196 @@ def _parse_file_args(input_str: str) -> tuple[str, str]:
     return file_path, content
 
 
+# --- Helper Functions for the Scrape Cache ---
+def _normalize_url(url: str) -> str:
+    """
+    Returns the cache key for a URL: lowercase scheme and host, no fragment,
+    and no utm_* tracking parameters, so the same page always maps to one entry.
+    """
+    parts = urlsplit(url.strip())
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_")
+    ]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+def _scrape_cache_path(url: str) -> str:
+    """Returns the cache file for a URL, named after the SHA-1 of its normalized form."""
+    digest = hashlib.sha1(_normalize_url(url).encode("utf-8")).hexdigest()
+    return os.path.join(SCRAPE_CACHE_DIR, f"{digest}.json")
+
+
+# The most recently used pages are also kept in memory (normalized URL -> disk entry), so revisits
+# within a session skip reading and decoding the cache file
+_MEMORY_SCRAPE_CACHE: LRUCache = LRUCache(maxsize=128)
+_MEMORY_SCRAPE_CACHE_LOCK = threading.Lock()
+
+
+def _read_scrape_cache(url: str) -> Optional[str]:
+    """Returns the cached text for a URL, or None if it is missing, unreadable or older than SCRAPE_CACHE_TTL."""
+    if SCRAPE_CACHE_TTL <= 0:
+        return None
+    key = _normalize_url(url)
+    with _MEMORY_SCRAPE_CACHE_LOCK:
+        entry = _MEMORY_SCRAPE_CACHE.get(key)
+    if entry is None:
+        try:
+            with open(_scrape_cache_path(url), "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        with _MEMORY_SCRAPE_CACHE_LOCK:
+            _MEMORY_SCRAPE_CACHE[key] = entry
+    if time.time() - entry.get("fetched_at", 0) > SCRAPE_CACHE_TTL:
+        _remove_scrape_cache(url)
+        return None
+    return entry.get("text")
+
+
+def _remove_scrape_cache(url: str) -> None:
+    """Deletes the cached entry for a URL, from memory and disk."""
+    with _MEMORY_SCRAPE_CACHE_LOCK:
+        _MEMORY_SCRAPE_CACHE.pop(_normalize_url(url), None)
+    try:
+        os.remove(_scrape_cache_path(url))
+    except OSError:
+        pass
+
+
+def _prune_scrape_cache() -> None:
+    """
+    Deletes expired cache files, then the oldest ones beyond SCRAPE_CACHE_MAX_ENTRIES,
+    so the cache directory doesn't grow with every page ever visited.
+    A file's modification time is when its page was fetched.
+    """
+    try:
+        # (modification time, path), oldest first
+        files = sorted(
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(SCRAPE_CACHE_DIR) if entry.name.endswith(".json")
+        )
+    except OSError:
+        return # e.g. a file deleted meanwhile by another thread's pruning; the next write tries again
+    expired_before = time.time() - SCRAPE_CACHE_TTL
+    num_expired = sum(1 for fetched_at, _ in files if fetched_at < expired_before)
+    for _, path in files[:max(num_expired, len(files) - SCRAPE_CACHE_MAX_ENTRIES)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _write_scrape_cache(url: str, text: str) -> None:
+    """Stores the text for a URL. Best-effort: a cache that can't be written is simply skipped."""
+    if SCRAPE_CACHE_TTL <= 0:
+        return
+    entry = {"url": url, "fetched_at": time.time(), "text": text}
+    with _MEMORY_SCRAPE_CACHE_LOCK:
+        _MEMORY_SCRAPE_CACHE[_normalize_url(url)] = entry
+    path = _scrape_cache_path(url)
+    try:
+        os.makedirs(SCRAPE_CACHE_DIR, exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see half an entry
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+        os.replace(temp_path, path)
+    except OSError:
+        return
+    _prune_scrape_cache()
+
+
+# --- Helper Functions for the Search and Weather Cache ---
+# Agents often repeat a search or weather lookup within one session; those are answered from memory
+_RESPONSE_CACHE: TTLCache = TTLCache(maxsize=256, ttl=300)
+_RESPONSE_CACHE_LOCK = threading.Lock() # TTLCache isn't thread-safe and tools run in worker threads
+
+
+def _response_cache_key(tool: str, query: str) -> tuple[str, str]:
+    """Returns the cache key for a tool input; case and extra whitespace don't matter."""
+    return tool, " ".join(query.lower().split())
+
+
+def _read_response_cache(tool: str, query: str) -> Optional[str]:
+    """Returns the cached result of tool for query, or None if it is missing or expired."""
+    with _RESPONSE_CACHE_LOCK:
+        return _RESPONSE_CACHE.get(_response_cache_key(tool, query))
+
+
+def _write_response_cache(tool: str, query: str, result: str) -> None:
+    """Stores a successful result of tool for query."""
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE[_response_cache_key(tool, query)] = result
+
+
+# --- Arithmetic Evaluator for the Calculator ---
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+# Largest integer result, about 4,200 digits (Python won't convert longer ints to str anyway).
+# Powers and products of huge integers could otherwise hold a worker thread for minutes
+_MAX_RESULT_BITS = 14000
+
+
+def _check_result_size(op: ast.operator, left: Union[int, float], right: Union[int, float]) -> None:
+    """Raises ValueError if an integer power or product would exceed _MAX_RESULT_BITS, before computing it."""
+    if type(left) is not int or type(right) is not int:
+        return # Float arithmetic is fast and overflows instead of growing
+    if isinstance(op, ast.Pow) and right > 0 and abs(left) > 1:
+        bits = right * math.log2(abs(left))
+    elif isinstance(op, ast.Mult):
+        bits = left.bit_length() + right.bit_length()
+    else:
+        return
+    if bits > _MAX_RESULT_BITS:
+        raise ValueError("the result is too large")
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_expression(expression: str) -> ast.expr:
+    """Parses an expression once; the agent often repeats the same calculation."""
+    return ast.parse(expression.strip(), mode="eval").body
+
+
+def _eval_node(node: ast.expr) -> Union[int, float]:
+    """
+    Evaluates an arithmetic syntax tree: numbers, + - * / // % ** and unary plus and minus.
+    Anything else (names, calls, attributes...) raises ValueError, and so do complex results.
+    """
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _eval_node(node.left), _eval_node(node.right)
+        _check_result_size(node.op, left, right)
+        result = _BINARY_OPERATORS[type(node.op)](left, right)
+        # A fractional power of a negative number, e.g. (-8) ** (1/3)
+        if isinstance(result, complex):
+            raise ValueError("the result is not a real number")
+        return result
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_eval_node(node.operand))
+    raise ValueError(f"unsupported syntax: {ast.unparse(node)}")
+
+
 def calculator(expression: str) -> str:
     """
     Evaluates a single, simple mathematical expression.
     Input: A string-formatted mathematical operation (e.g., "2 * (10 + 5)").
     """
     try:
-        # Use Union for type checker, but cast to str for the agent
-        result: Union[float, int, str] = eval(expression, {"__builtins__": None}, {})
+        # Walk the parsed expression instead of eval'ing it: no code object, no access to Python
+        result = _eval_node(_parse_expression(expression))
         return str(result)
     except Exception as e:
         return f"Error evaluating expression: {e}"
@@ -40,8 +246,13 @@ def calculator(expression: str) -> str:
 def search_internet(query: str) -> str:
     """
     Performs a web search using Serper.dev API and returns the top 5 results.
+    Successful results are cached in memory for 5 minutes.
     Input: A string-based search query.
     """
+    cached = _read_response_cache("search_internet", query)
+    if cached is not None:
+        return cached
+
     try:
         api_key = os.environ.get("SERPER_API_KEY")
         if not api_key:
@@ -56,13 +267,13 @@ def search_internet(query: str) -> str:
             "num": 5
         }
         
-        response = requests.post(
+        response = _SESSION.post(
             "https://google.serper.dev/search",
             headers=headers,
-            json=payload
+            data=orjson.dumps(payload)
         )
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         
         # Check if "organic" key exists AND is not empty
         organic_results = data.get("organic")
@@ -70,11 +281,14 @@ def search_internet(query: str) -> str:
             return "No relevant information or search results found."
             
         # Format the results into a concise string for LLM consumption
+        # (dict.get is bound once instead of being looked up three times per result)
+        get = dict.get
         formatted_results = "\n".join(
-            [f"- {res.get('title', 'No title')}: {res.get('snippet', 'No description')} <{res.get('link', '#')}>"
-             for res in organic_results]
+            f"- {get(res, 'title', 'No title')}: {get(res, 'snippet', 'No description')} <{get(res, 'link', '#')}>"
+            for res in organic_results
         )
 
+        _write_response_cache("search_internet", query, formatted_results)
         return formatted_results
 
     except requests.exceptions.RequestException as e:
@@ -83,33 +297,97 @@ def search_internet(query: str) -> str:
         return f"Error during internet search: {e}"
     
 
+# Most pages scrape_many reads in one call; they are fetched at once and share _SESSION's connection pool
+SCRAPE_MANY_MAX_URLS = 5
+# Only the first MAX_OUTPUT_CHARS characters of text are kept, so there's no point downloading (and parsing) huge pages
+MAX_PAGE_BYTES = 2_000_000
+# Content types that are parsed; anything else (PDFs, images, videos...) is rejected before its body is downloaded
+_HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+_CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+# Elements whose text isn't part of the page's visible content (<head> holds only metadata, scripts and styles)
+_NON_CONTENT_TAGS = ("head", "script", "style", "header", "footer", "nav", "noscript", "svg", "iframe")
+
+
+def _join_capped(parts: Iterable[str], limit: int, separator: str = "\n") -> str:
+    """
+    Joins parts with separator, but stops pulling from parts once the text is limit characters long.
+    When parts is lazy, whatever lies past the limit (pages, paragraphs, text nodes) is never processed.
+    """
+    collected: List[str] = []
+    total = 0
+    for part in parts:
+        collected.append(part)
+        total += len(part) + len(separator)
+        if total >= limit:
+            break
+    return separator.join(collected)[:limit]
+
+
+def _read_capped(response: requests.Response, max_bytes: int) -> bytes:
+    """Reads a streamed response body, stopping after max_bytes."""
+    buffer = bytearray()
+    for chunk in response.iter_content(65536):
+        buffer.extend(chunk)
+        if len(buffer) >= max_bytes:
+            break
+    return bytes(buffer[:max_bytes])
+
+
 def scrape_content(url: str) -> str:
     """
     Fetches the clean, visible text content from a single URL.
+    Successful results are cached on disk for SCRAPE_CACHE_TTL seconds.
     Input: A single, valid URL (e.g., "https://example.com/article").
-    """    
-    # Custom User-Agent to mimic a real browser
+    """
+    cached = _read_scrape_cache(url)
+    if cached is not None:
+        return cached
+
+    # Custom User-Agent to mimic a real browser, and every compression urllib3 can decode
+    # (brotli/zstd only when their packages are installed)
     headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+        **make_headers(accept_encoding=True)
     }
     
     try:
-        # Fetch the page with a custom header
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status() # Catches 4xx/5xx errors
+        # Fetch the page with a custom header, streaming the body so at most MAX_PAGE_BYTES are downloaded
+        response = _SESSION.get(url, headers=headers, timeout=15, stream=True)
+        try:
+            response.raise_for_status() # Catches 4xx/5xx errors
+            # Only the headers have arrived so far. A server that doesn't say what it sends gets the benefit of the doubt
+            content_type = response.headers.get("Content-Type", "")
+            if content_type and not content_type.lower().startswith(_HTML_CONTENT_TYPES):
+                return f"Error: {url} is not a web page (Content-Type: {content_type})"
+            content = _read_capped(response, MAX_PAGE_BYTES)
+        finally:
+            response.close()
         
-        # Parse the HTML content
-        soup = BeautifulSoup(response.content, "html.parser")
+        # Imported here so that sessions which never scrape don't pay for loading lxml
+        import lxml.html
+        from lxml import etree
+
+        # Parse the HTML content with lxml directly; no Python object is created per node.
+        # A charset declared by the server overrides lxml's own detection (from <meta> tags)
+        charset = _CHARSET_RE.search(content_type)
+        try:
+            parser = lxml.html.HTMLParser(encoding=charset.group(1)) if charset else None
+        except LookupError: # A charset libxml2 doesn't know (e.g. "utf8mb4"): detect it as if none was declared
+            parser = None
+        root = lxml.html.document_fromstring(content, parser=parser)
         
-        # Remove script, style, and comments elements to clean up the content
-        for script_or_style in soup(["script", "style", "header", "footer", "nav"]):
-            script_or_style.decompose()
+        # Remove script, style, and other non-content elements, keeping the text that follows them
+        etree.strip_elements(root, *_NON_CONTENT_TAGS, with_tail=False)
             
-        # Get all visible text and join it, removing excessive whitespace and newlines
-        clean_text = soup.get_text(separator=" ", strip=True)
+        # Get the visible text node by node, separating text nodes (e.g. of adjacent <p>s) and collapsing
+        # runs of whitespace and newlines into single spaces. Whitespace-only nodes are skipped
+        text_nodes = (clean for node in root.itertext() if (clean := " ".join(node.split())))
         
-        # Limit the output to the first 8000 characters to avoid overwhelming the LLM
-        return clean_text[:8000] 
+        # Limit the output to the first MAX_OUTPUT_CHARS characters to avoid overwhelming the LLM;
+        # the rest of the page's text is never even collected
+        text = _join_capped(text_nodes, MAX_OUTPUT_CHARS, separator=" ")
+        _write_scrape_cache(url, text)
+        return text
 
     except requests.exceptions.HTTPError as e:
         return f"Error retrieving content (HTTP Status Code): {e}"
@@ -117,50 +395,125 @@ def scrape_content(url: str) -> str:
         return f"Error connecting to URL: {e}"
     except Exception as e:
         return f"An unexpected error occurred during scraping: {e}"
+
+
+def scrape_many(urls: Union[List[str], str]) -> str:
+    """
+    Fetches the clean, visible text content of several URLs concurrently.
+    Each page is scraped (and cached) exactly like scrape_content; failures are reported per URL.
+    At most SCRAPE_MANY_MAX_URLS pages are read, and together they share the MAX_OUTPUT_CHARS budget.
+    Input: A list of URLs (e.g., ["https://example.com/a", "https://example.org/b"]).
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+    # Duplicates are fetched once, the order of first appearance is kept
+    url_list = list(dict.fromkeys(url.strip() for url in urls if url.strip()))
+    if not url_list:
+        return "Error: no URLs given"
+    skipped = url_list[SCRAPE_MANY_MAX_URLS:]
+    url_list = url_list[:SCRAPE_MANY_MAX_URLS]
+
+    # Downloads are I/O-bound, so threads overlap them; map keeps the results in input order
+    with ThreadPoolExecutor(max_workers=len(url_list)) as executor:
+        texts = list(executor.map(scrape_content, url_list))
+
+    per_page = MAX_OUTPUT_CHARS // len(url_list)
+    result = "\n\n".join(f"=== {url} ===\n{text[:per_page]}" for url, text in zip(url_list, texts))
+    if skipped:
+        result += f"\n\n(Skipped {len(skipped)} more URLs, at most {SCRAPE_MANY_MAX_URLS} are read per call: {', '.join(skipped)})"
+    return result
     
 
 def get_weather(location: str) -> str:
     """
     Fetches the current weather for a specific location.
+    Successful results are cached in memory for 5 minutes.
     Input: A single string of the location (e.g., "Tokyo" or "Paris, France").
     """
+    cached = _read_response_cache("get_weather", location)
+    if cached is not None:
+        return cached
+
     try:
         api_key = os.environ.get("WEATHER_API_KEY")
-        response = requests.get(f"http://api.weatherapi.com/v1/current.json?key={api_key}&q={location}", timeout=10)
-        data = response.json()
+        response = _SESSION.get(f"http://api.weatherapi.com/v1/current.json?key={api_key}&q={location}", timeout=10)
+        data = orjson.loads(response.content)
         if "current" in data:
             temp_c = data["current"]["temp_c"]
             condition = data["current"]["condition"]["text"]
-            return f"The current temperature in {location} is {temp_c}°C with {condition}."
+            weather = f"The current temperature in {location} is {temp_c}°C with {condition}."
+            _write_response_cache("get_weather", location, weather)
+            return weather
         else:
             return "Weather information not found."
     except Exception as e:
         return f"Error retrieving weather data: {e}"
     
 
+# XML namespace of the main part of a .docx file (word/document.xml)
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# Run children that carry text: text, tabs, and line breaks
+_RUN_CONTENT_TAGS = tuple(f"{_WORD_NS}{tag}" for tag in ("t", "tab", "br", "cr"))
+
+
+def _read_docx(file_path: str, limit: int) -> str:
+    """
+    Returns the paragraphs of a .docx file, one per line, up to limit characters.
+    Streams word/document.xml with iterparse instead of building python-docx's object model,
+    and stops parsing once enough text has been read.
+    """
+    from lxml import etree
+
+    def run_text(element) -> str:
+        """Returns the text of one element of a run, as python-docx's paragraph.text renders it."""
+        if element.tag == f"{_WORD_NS}t":
+            return element.text or ""
+        if element.tag == f"{_WORD_NS}tab":
+            return "\t"
+        if element.tag == f"{_WORD_NS}br":
+            # Page and column breaks only move the text; line breaks (the default type) are newlines
+            return "\n" if element.get(f"{_WORD_NS}type", "textWrapping") == "textWrapping" else ""
+        return "\n" # <w:cr/>
+
+    def paragraph_texts(xml):
+        # The archive is user-supplied: never expand entities (lxml < 5 resolves external ones) or fetch anything
+        for _, paragraph in etree.iterparse(xml, tag=f"{_WORD_NS}p", resolve_entities=False, no_network=True):
+            # A paragraph's text is split over runs. Only children of runs count:
+            # <w:tab> elements inside the paragraph properties define tab stops
+            yield "".join(
+                run_text(element)
+                for element in paragraph.iter(_RUN_CONTENT_TAGS)
+                if element.getparent().tag == f"{_WORD_NS}r"
+            )
+            paragraph.clear()
+
+    with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as xml:
+        return _join_capped(paragraph_texts(xml), limit)
+
+
 def read_file_content(file_path: str) -> str:
     """
-    Reads and returns the content of a local file (limited to 8000 chars).
+    Reads and returns the content of a local file (limited to MAX_OUTPUT_CHARS chars).
     Input: A single string of the file path (e.g., "notes.txt" or "folder/report.md").
     """
     if not os.path.isfile(file_path):
         return f"File not found: {file_path}"
     ext = os.path.splitext(file_path)[1].lower()
 
-    text = ""
-
     try:
+        # pdfplumber takes ~75ms to import, so it's only loaded for PDFs
         if ext == ".pdf":
+            import pdfplumber
             with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text += page.extract_text() + "\n"
+                # Pages without a text layer (scans) return None
+                text = _join_capped((page.extract_text() or "" for page in pdf.pages), MAX_OUTPUT_CHARS)
         elif ext == ".docx":
-            doc = docx.Document(file_path)
-            for para in doc.paragraphs:
-                text += para.text + "\n"
+            text = _read_docx(file_path, MAX_OUTPUT_CHARS)
         elif ext in [".txt", ".md", ".csv"]:
-            with open(file_path, "r", encoding="utf-8") as file:
-                text = file.read()
+            # Text mode decodes incrementally, so only the first few KB of a large file are read.
+            # Stray non-UTF-8 bytes become U+FFFD instead of failing the whole read
+            with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+                text = file.read(MAX_OUTPUT_CHARS)
         else:
             return f"Unsupported file type: {ext}"
         return text.strip()
@@ -199,7 +552,91 @@ known_actions = {
     "calculator": calculator,
     "search_internet": search_internet,
     "scrape_content": scrape_content,
+    "scrape_many": scrape_many,
     "get_weather": get_weather,
     "read_file_content": read_file_content,
     "write_file_content": write_file_content,
-}
\ No newline at end of file
+}
+
+
+# --- Tool Schemas for OpenAI Function Calling ---
+def _function_schema(name: str, description: str, parameters: Dict[str, Union[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Builds the OpenAI tool definition for a tool whose parameters are all required.
+    parameters maps each parameter name, in the order the tool expects them, to its description
+    (for a string parameter) or to its full JSON schema.
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    param: {"type": "string", "description": param_schema} if isinstance(param_schema, str) else param_schema
+                    for param, param_schema in parameters.items()
+                },
+                "required": list(parameters),
+                "additionalProperties": False
+            }
+        }
+    }
+
+
+tool_schemas: List[Dict[str, Any]] = [
+    _function_schema(
+        "calculator",
+        "Perform mathematical computations.",
+        {"expression": "A single arithmetic expression, e.g. 2 * (10 + 5)."}
+    ),
+    _function_schema(
+        "search_internet",
+        "Search the internet and return the top results with their URLs. Use this to FIND sources.",
+        {"query": "The search query, e.g. current inflation rate in Vietnam 2025."}
+    ),
+    _function_schema(
+        "scrape_content",
+        "Fetch the visible text of a web page. Use this when you already have a URL (from the user or a search) and need the page's actual content.",
+        {"url": "A single, valid URL, e.g. https://example.com/article."}
+    ),
+    _function_schema(
+        "scrape_many",
+        "Fetch the visible text of several web pages (at most 5) at once; the pages share one 8000-character budget. "
+        "Prefer this over several scrape_content calls when you have multiple URLs to skim.",
+        {"urls": {"type": "array", "items": {"type": "string"}, "description": "The URLs to read, e.g. [\"https://example.com/a\", \"https://example.org/b\"]."}}
+    ),
+    _function_schema(
+        "get_weather",
+        "Retrieve the current weather for a location.",
+        {"location": "A city or place, e.g. Tokyo or Paris, France."}
+    ),
+    _function_schema(
+        "read_file_content",
+        "Read a local .txt, .md, .csv, .pdf or .docx file.",
+        {"file_path": "The path of the file, e.g. notes.txt."}
+    ),
+    _function_schema(
+        "write_file_content",
+        "Write text to a local file, OVERWRITING any existing content.",
+        {"file_path": "The path of the file, e.g. summary.txt.", "content": "The text to write."}
+    ),
+]
+
+# Parameter names of every tool, in the order its input string expects them
+_TOOL_PARAMETERS = {
+    schema["function"]["name"]: list(schema["function"]["parameters"]["properties"])
+    for schema in tool_schemas
+}
+
+
+def format_action_input(name: str, arguments: Dict[str, Any]) -> Any:
+    """
+    Converts the JSON arguments of a tool call into the single input the tool takes.
+    Single-parameter tools get the bare value (a string, or a list for scrape_many); multi-parameter
+    tools get the quoted, comma-separated string read by _parse_file_args (e.g. "notes.txt", "Some notes").
+    """
+    values = [arguments[param] for param in _TOOL_PARAMETERS[name]]
+    if len(values) == 1:
+        return values[0]
+    return ", ".join(f'"{value}"' for value in values)